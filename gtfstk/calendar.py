@@ -1,7 +1,7 @@
 """
 Functions about calendar and calendar_dates.
 """
-import dateutil.relativedelta as rd
+import pandas as pd
 
 from . import helpers as hp
 
@@ -40,14 +40,13 @@ def get_dates(feed, as_date_obj=False):
 
     start_date, end_date = min(dates), max(dates)
     start_date, end_date = map(hp.datestr_to_date, [start_date, end_date])
-    num_days = (end_date - start_date).days
-    result = [start_date + rd.relativedelta(days=+d)
-      for d in range(num_days + 1)]
+    result = pd.date_range(start_date, end_date, freq='D')
 
     # Convert dates back to strings if required
-    if not as_date_obj:
-        result = [hp.datestr_to_date(x, inverse=True)
-          for x in result]
+    if as_date_obj:
+        result = result.date.tolist()
+    else:
+        result = result.strftime('%Y%m%d').tolist()
 
     return result
 
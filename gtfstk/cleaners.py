@@ -107,7 +107,10 @@ def clean_times(feed):
     for table, columns in tables_and_columns:
         f = getattr(feed, table)
         if f is not None:
-            f[columns] = f[columns].applymap(reformat)
+            # Reformat each distinct time string only once
+            for col in columns:
+                f[col] = f[col].map({t: reformat(t)
+                  for t in f[col].dropna().unique()})
         setattr(feed, table, f)
 
     return feed
@@ -145,7 +145,8 @@ FEED_ATTRS_1 = [
 FEED_ATTRS_2 = [
     '_trips_i',
     '_calendar_i',
-    '_calendar_dates_g',
+    '_calendar_by_service',
+    '_calendar_dates_by_service_date',
 ]
 
 #:
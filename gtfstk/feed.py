@@ -16,14 +16,19 @@ parameter in the method signatures.
 Ignore that extra parameter; it refers to the Feed instance,
 usually called ``self`` and usually hidden automatically by Sphinx.
 """
+import io
 from pathlib import Path
-import tempfile
-import shutil
-from copy import deepcopy
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import zipfile
 
 import pandas as pd
+import numpy as np
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
 
 from . import constants as cs
 from . import helpers as hp
@@ -210,13 +215,22 @@ class Feed(object):
     @trips.setter
     def trips(self, val):
         """
-        Update ``self._trips_i`` if ``self.trips`` changes.
+        Reset ``self._trips_i`` if ``self.trips`` changes.
         """
         self._trips = val
-        if val is not None and not val.empty:
-            self._trips_i = self._trips.set_index('trip_id')
-        else:
-            self._trips_i = None
+        self._trips_i_cache = None
+
+    @property
+    def _trips_i(self):
+        """
+        The trips table of this Feed indexed by trip ID.
+        Build it on first use after ``self.trips`` changes rather than
+        on every change, since indexing copies the table.
+        """
+        if self._trips_i_cache is None and self._trips is not None and\
+          not self._trips.empty:
+            self._trips_i_cache = self._trips.set_index('trip_id')
+        return self._trips_i_cache
 
     @property
     def calendar(self):
@@ -228,13 +242,36 @@ class Feed(object):
     @calendar.setter
     def calendar(self, val):
         """
-        Update ``self._calendar_i``if ``self.calendar`` changes.
+        Reset ``self._calendar_i`` and update
+        ``self._calendar_by_service`` if ``self.calendar`` changes.
         """
         self._calendar = val
-        if val is not None and not val.empty:
-            self._calendar_i = self._calendar.set_index('service_id')
+        self._calendar_i_cache = None
+
+        # Record each service's date range and weekdays as a bitmask
+        # with bit i set if and only if the service runs on weekday i,
+        # to speed up :func:`.trips.is_active_trip`
+        weekdays = [hp.weekday_to_str(i) for i in range(7)]
+        cols = ['service_id', 'start_date', 'end_date'] + weekdays
+        if val is not None and not val.empty and set(cols) <= set(
+          val.columns):
+            masks = (val[weekdays].values == 1).dot(1 << np.arange(7))
+            self._calendar_by_service = dict(zip(val['service_id'].values,
+              zip(val['start_date'].values, val['end_date'].values,
+              masks.tolist())))
         else:
-            self._calendar_i = None
+            self._calendar_by_service = None
+
+    @property
+    def _calendar_i(self):
+        """
+        The calendar table of this Feed indexed by service ID.
+        Build it on first use after ``self.calendar`` changes.
+        """
+        if self._calendar_i_cache is None and\
+          self._calendar is not None and not self._calendar.empty:
+            self._calendar_i_cache = self._calendar.set_index('service_id')
+        return self._calendar_i_cache
 
     @property
     def calendar_dates(self):
@@ -246,15 +283,23 @@ class Feed(object):
     @calendar_dates.setter
     def calendar_dates(self, val):
         """
-        Update ``self._calendar_dates_g``
+        Update ``self._calendar_dates_by_service_date``
         if ``self.calendar_dates`` changes.
         """
         self._calendar_dates = val
-        if val is not None and not val.empty:
-            self._calendar_dates_g = self._calendar_dates.groupby(
-              ['service_id', 'date'])
+
+        # Record the exception type of each (service, date) pair,
+        # keeping the first one in case of duplicates,
+        # to speed up :func:`.trips.is_active_trip`
+        cols = ['service_id', 'date', 'exception_type']
+        if val is not None and not val.empty and set(cols) <= set(
+          val.columns):
+            f = val[cols].iloc[::-1]
+            self._calendar_dates_by_service_date = dict(zip(
+              zip(f['service_id'].values, f['date'].values),
+              f['exception_type'].values.tolist()))
         else:
-            self._calendar_dates_g = None
+            self._calendar_dates_by_service_date = None
 
     def __str__(self):
         """
@@ -300,17 +345,15 @@ class Feed(object):
         """
         Return a copy of this feed, that is, a feed with all the same
         attributes.
+        Copy only the primary attributes and let the @property magic
+        rebuild the derived ones.
         """
         other = Feed(dist_units=self.dist_units)
-        for key in set(cs.FEED_ATTRS) - set(['dist_units']):
+        for key in set(cs.FEED_ATTRS_1) - set(['dist_units']):
             value = getattr(self, key)
             if isinstance(value, pd.DataFrame):
                 # Pandas copy DataFrame
                 value = value.copy()
-            elif isinstance(value, pd.core.groupby.DataFrameGroupBy):
-                # Pandas does not have a copy method for groupby objects
-                # as far as i know
-                value = deepcopy(value)
             setattr(other, key, value)
 
         return other
@@ -353,6 +396,65 @@ def list_gtfs(path):
 
     return pd.DataFrame(rows)
 
+def read_gtfs_table(path):
+    """
+    Read the GTFS text file at the given path (string or Path object)
+    or in the given binary file object into a DataFrame,
+    reading the columns in
+    :const:`.constants.STR_COLS` as strings, and return the result.
+
+    Notes
+    -----
+    - Use the multithreaded CSV parser of PyArrow if it is installed,
+      and the Pandas CSV parser otherwise
+    - Read columns that PyArrow would parse as dates, times, or
+      timestamps as strings, as Pandas does
+    - Automatically strip whitespace from the column names
+
+    """
+    if pa is not None:
+        if hasattr(path, 'read'):
+            # Buffer the file object, so that it can be reread below
+            buffer = pa.py_buffer(path.read())
+            get_src = lambda: pa.BufferReader(buffer)
+        else:
+            get_src = lambda: str(path)
+        column_types = {col: pa.string() for col in cs.STR_COLS}
+        options = pacsv.ConvertOptions(column_types=column_types,
+          strings_can_be_null=True)
+        t = pacsv.read_csv(get_src(), convert_options=options)
+        # Reread as strings any columns that PyArrow parsed as dates,
+        # times, or timestamps
+        temporal_cols = [field.name for field in t.schema
+          if pa.types.is_temporal(field.type)]
+        if temporal_cols:
+            column_types.update({col: pa.string() for col in temporal_cols})
+            options = pacsv.ConvertOptions(column_types=column_types,
+              strings_can_be_null=True)
+            t = pacsv.read_csv(get_src(), convert_options=options)
+        if not t.num_rows:
+            # Read a header-only file as object columns with an empty
+            # object index, as Pandas does
+            df = pd.DataFrame(columns=t.column_names)
+        else:
+            # Read columns of only nulls as floats, as Pandas does
+            for i, field in enumerate(t.schema):
+                if pa.types.is_null(field.type):
+                    t = t.set_column(i, field.name,
+                      t.column(i).cast(pa.float64()))
+            df = t.to_pandas()
+            # Use NaN rather than None for null strings, as Pandas does
+            for col in df.columns[df.dtypes == object]:
+                isnull = df[col].isnull()
+                if isnull.any():
+                    df.loc[isnull, col] = np.nan
+    else:
+        # utf-8-sig gets rid of the byte order mark (BOM);
+        # see http://stackoverflow.com/questions/17912307/u-ufeff-in-python-string
+        df = pd.read_csv(path, dtype=cs.DTYPE, encoding='utf-8-sig')
+
+    return cn.clean_column_names(df)
+
 def read_gtfs(path, dist_units=None):
     """
     Create a Feed instance from the given path and given distance units.
@@ -370,32 +472,34 @@ def read_gtfs(path, dist_units=None):
     if not path.exists():
         raise ValueError("Path {!s} does not exist".format(path))
 
-    # Unzip path to temporary directory if necessary
+    # Read files into feed dictionary of DataFrames,
+    # parsing them concurrently, since the parsers release the GIL
+    feed_dict = {table: None for table in cs.GTFS_REF['table']}
     if path.is_file():
-        zipped = True
-        tmp_dir = tempfile.TemporaryDirectory()
-        src_path = Path(tmp_dir.name)
-        shutil.unpack_archive(str(path), tmp_dir.name, 'zip')
+        # Read the files straight from the zip archive rather than
+        # unzipping it to a temporary directory first
+        with zipfile.ZipFile(str(path)) as zf:
+            infos = [x for x in zf.infolist() if not x.filename.endswith('/')
+              and Path(x.filename).parent == Path('.')
+              and Path(x.filename).stem in feed_dict]
+            # Decompress the files one at a time, since zip archives
+            # can't be read from several threads before Python 3.5
+            srcs = [io.BytesIO(zf.read(x)) for x in infos]
+
+        num_workers = hp.get_max_workers(len(infos))
+        with ThreadPoolExecutor(num_workers) as executor:
+            for x, f in zip(infos, executor.map(read_gtfs_table, srcs)):
+                feed_dict[Path(x.filename).stem] = f
     else:
-        zipped = False
-        src_path = path
-
-    # Read files into feed dictionary of DataFrames
-    feed_dict = {table: None for table in cs.GTFS_REF['table']}
-    for p in src_path.iterdir():
-        table = p.stem
-        if p.is_file() and table in feed_dict:
-            # utf-8-sig gets rid of the byte order mark (BOM);
-            # see http://stackoverflow.com/questions/17912307/u-ufeff-in-python-string
-            df = pd.read_csv(p, dtype=cs.DTYPE, encoding='utf-8-sig')
-            feed_dict[table] = cn.clean_column_names(df)
+        paths = [p for p in path.iterdir()
+          if p.is_file() and p.stem in feed_dict]
+        num_workers = hp.get_max_workers(len(paths))
+        with ThreadPoolExecutor(num_workers) as executor:
+            for p, f in zip(paths, executor.map(read_gtfs_table, paths)):
+                feed_dict[p.stem] = f
 
     feed_dict['dist_units'] = dist_units
 
-    # Delete temporary directory
-    if zipped:
-        tmp_dir.cleanup()
-
     # Create feed
     return Feed(**feed_dict)
 
@@ -412,34 +516,50 @@ def write_gtfs(feed, path, ndigits=6):
     path = Path(path)
 
     if path.suffix == '.zip':
-        # Write to temporary directory before zipping
+        # Write straight into the zip archive
         zipped = True
-        tmp_dir = tempfile.TemporaryDirectory()
-        new_path = Path(tmp_dir.name)
     else:
         zipped = False
         if not path.exists():
             path.mkdir()
-        new_path = path
 
-    for table in cs.GTFS_REF['table'].unique():
+    float_format = '%.{!s}f'.format(ndigits)
+    int_cols = frozenset(cs.INT_COLS)
+
+    def write_table(table):
         f = getattr(feed, table)
-        if f is None:
-            continue
 
-        f = f.copy()
         # Some columns need to be output as integers.
         # If there are NaNs in any such column,
         # then Pandas will format the column as float, which we don't want.
-        f_int_cols = set(cs.INT_COLS) & set(f.columns)
-        for s in f_int_cols:
-            f[s] = f[s].fillna(-1).astype(int).astype(str).\
-              replace('-1', '')
-        p = new_path/(table + '.txt')
-        f.to_csv(str(p), index=False, float_format='%.{!s}f'.format(ndigits))
-
-    # Zip directory
-    if zipped:
-        basename = str(path.parent/path.stem)
-        shutil.make_archive(basename, format='zip', root_dir=tmp_dir.name)
-        tmp_dir.cleanup()
+        # So format those columns as strings, writing NaNs as empty
+        # strings, in a shallow copy of the table
+        f_int_cols = [c for c in f.columns if c in int_cols]
+        if f_int_cols:
+            f = f.copy(deep=False)
+            for s in f_int_cols:
+                a = f[s].values
+                isnull = pd.isnull(a)
+                b = np.full(a.shape[0], '', dtype=object)
+                b[~isnull] = a[~isnull].astype(np.int64).astype(str)
+                f[s] = b
+        if zipped:
+            return f.to_csv(index=False, float_format=float_format)
+        else:
+            f.to_csv(str(path/(table + '.txt')), index=False,
+              float_format=float_format)
+
+    # Write the tables concurrently, but add them to the zip archive
+    # one at a time, since zip files do not support concurrent writes
+    tables = [table for table in cs.GTFS_REF['table'].unique()
+      if getattr(feed, table) is not None]
+    num_workers = hp.get_max_workers(len(tables))
+    with ThreadPoolExecutor(num_workers) as executor:
+        texts = executor.map(write_table, tables)
+        if zipped:
+            with zipfile.ZipFile(str(path), 'w', zipfile.ZIP_DEFLATED) as zf:
+                for table, text in zip(tables, texts):
+                    zf.writestr(table + '.txt', text)
+        else:
+            # Wait for the writes, raising any of their errors
+            list(texts)
@@ -2,7 +2,7 @@
 Functions useful across modules.
 """
 import datetime as dt
-import dateutil.relativedelta as rd
+import os
 
 import pandas as pd
 import numpy as np
@@ -22,7 +22,11 @@ def datestr_to_date(x, format_str='%Y%m%d', inverse=False):
     if x is None:
         return None
     if not inverse:
-        result = dt.datetime.strptime(x, format_str).date()
+        if format_str == '%Y%m%d' and len(x) == 8 and x.isdigit():
+            # Slicing the digits is much faster than strptime
+            result = dt.date(int(x[:4]), int(x[4:6]), int(x[6:]))
+        else:
+            result = dt.datetime.strptime(x, format_str).date()
     else:
         result = x.strftime(format_str)
     return result
@@ -58,6 +62,81 @@ def timestr_to_seconds(x, inverse=False, mod24=False):
             result = np.nan
     return result
 
+def timestrs_to_seconds(x, inverse=False, mod24=False):
+    """
+    Vectorized version of :func:`timestr_to_seconds` that acts on a
+    Series (or array) ``x`` and returns a Series with the same index.
+
+    Notes
+    -----
+    Rather than calling :func:`timestr_to_seconds` on each element,
+    do digit arithmetic on the characters of the time strings as a
+    NumPy array.
+    GTFS times repeat a lot, so only the distinct values of ``x`` are
+    converted.
+    Only elements in an unusual format, such as time strings with
+    surrounding whitespace or with more than two hour digits, fall
+    back to :func:`timestr_to_seconds`.
+    """
+    x = pd.Series(x)
+    codes, v = pd.factorize(x)
+    v = np.asarray(v)
+    if not inverse:
+        r = np.full(v.size, np.nan)
+        if v.size:
+            try:
+                c = v.astype('U').view(np.uint32).reshape(v.size, -1)
+            except (TypeError, ValueError):
+                # Elements are not all strings
+                c = np.zeros((v.size, 8), dtype=np.uint32)
+            if c.shape[1] < 8:
+                c = np.pad(c, ((0, 0), (0, 8 - c.shape[1])), 'constant')
+            n = (c != 0).sum(axis=1)
+            # Left-pad time strings of the form H:MM:SS with a zero
+            short = n == 7
+            c[short, 1:8] = c[short, :7]
+            c[short, 0] = ord('0')
+            d = c[:, :8].astype(np.int64) - ord('0')
+            good = (short | (n == 8)) & (d[:, 2] == 10) & (d[:, 5] == 10)
+            digits = d[:, [0, 1, 3, 4, 6, 7]]
+            good &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+            seconds = digits.dot([36000, 3600, 600, 60, 10, 1])
+            r = np.where(good, seconds, np.nan)
+            # Fall back to the scalar function for unusual time strings
+            bad = ~good
+            if bad.any():
+                r[bad] = [timestr_to_seconds(t) for t in v[bad]]
+        if mod24:
+            r %= 24*3600
+        result = np.full(x.shape[0], np.nan)
+        result[codes >= 0] = r[codes[codes >= 0]]
+        result = pd.Series(result, index=x.index)
+        if not np.isnan(result.values).any():
+            result = result.astype(np.int64)
+    else:
+        r = np.full(v.size, np.nan, dtype=object)
+        seconds = pd.to_numeric(pd.Series(v), errors='coerce').values
+        notnull = ~np.isnan(seconds)
+        s = seconds[notnull].astype(np.int64)
+        if s.size:
+            if mod24:
+                s %= 24*3600
+            hours, mins, secs = s//3600, (s % 3600)//60, s % 60
+            c = np.stack([hours//10, hours % 10, np.full_like(s, 10),
+              mins//10, mins % 10, np.full_like(s, 10),
+              secs//10, secs % 10], axis=1) + ord('0')
+            t = c.astype(np.uint32).view('U8').ravel().astype(object)
+            # Fall back to the scalar function for unusual numbers of hours
+            bad = (hours < 0) | (hours > 99)
+            if bad.any():
+                t[bad] = [timestr_to_seconds(u, inverse=True)
+                  for u in s[bad]]
+            r[notnull] = t
+        result = np.full(x.shape[0], np.nan, dtype=object)
+        result[codes >= 0] = r[codes[codes >= 0]]
+        result = pd.Series(result, index=x.index)
+    return result
+
 def timestr_mod24(timestr):
     """
     Given a GTFS HH:MM:SS time string, return a timestring in the same
@@ -149,11 +228,9 @@ def get_peak_indices(times, counts):
     Assume times and counts have the same nonzero length.
     """
     max_runs = get_max_runs(counts)
-
-    def get_duration(a):
-        return times[a[1]] - times[a[0]]
-
-    index = np.argmax(np.apply_along_axis(get_duration, 1, max_runs))
+    times = np.asarray(times)
+    durations = times[max_runs[:, 1]] - times[max_runs[:, 0]]
+    index = np.argmax(durations)
     return max_runs[index]
 
 def get_convert_dist(dist_units_in, dist_units_out):
@@ -164,6 +241,8 @@ def get_convert_dist(dist_units_in, dist_units_out):
       distance in the units ``dist_units_out``
 
     Only supports distance units in :const:`constants.DIST_UNITS`.
+    The function is multiplication by a constant, so it also accepts
+    NumPy arrays and Pandas Series of distances.
     """
     di, do = dist_units_in, dist_units_out
     DU = cs.DIST_UNITS
@@ -187,6 +266,10 @@ def almost_equal(f, g):
     """
     if f.empty or g.empty:
         return f.equals(g)
+    elif f.shape != g.shape or set(f.columns) != set(g.columns) or\
+      not f.dtypes.sort_index().equals(g.dtypes.sort_index()):
+        # Cheap checks that avoid sorting unequal DataFrames
+        return False
     else:
         # Put in canonical order
         F = f.sort_index(axis=1).sort_values(list(f.columns)).reset_index(
@@ -228,6 +311,48 @@ def linestring_to_utm(linestring):
     proj = lambda x, y: utm.from_latlon(y, x)[:2]
     return transform(proj, linestring)
 
+def latlons_to_utm(lats, lons):
+    """
+    Given arrays of WGS84 latitudes and longitudes of points,
+    convert the points to the UTM coordinates appropriate to each
+    point, as ``utm.from_latlon`` does point by point,
+    and return the resulting NumPy array of (easting, northing) pairs.
+
+    Notes
+    -----
+    Convert all the points that lie in the same standard UTM zone and
+    hemisphere with one call to ``utm.from_latlon``, which is much
+    faster than converting them one by one.
+    Convert points north of latitude 56, where some nonstandard UTM
+    zones lie, one by one.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    result = np.empty((lats.size, 2))
+
+    # Compute standard UTM zone numbers as the utm package does
+    zones = np.floor(((lons % 360 + 540) % 360 - 180 + 180)/6)
+    keys = 2*zones + (lats >= 0)
+    special = lats >= 56
+    for key in np.unique(keys[~special]):
+        cond = ~special & (keys == key)
+        result[cond] = np.column_stack(
+          utm.from_latlon(lats[cond], lons[cond])[:2])
+    for i in np.flatnonzero(special):
+        result[i] = utm.from_latlon(lats[i], lons[i])[:2]
+
+    return result
+
+def get_max_workers(num_tasks):
+    """
+    Return the number of worker threads to use for the given number of
+    concurrent tasks, namely the number of tasks capped at the number
+    of CPUs, but at least one.
+    ``concurrent.futures.ThreadPoolExecutor`` requires this number
+    before Python 3.5.
+    """
+    return max(1, min(num_tasks, os.cpu_count() or 1))
+
 def count_active_trips(trip_times, time):
     """
     Count the number of trips in ``trip_times`` that are active
@@ -254,7 +379,142 @@ def count_active_trips(trip_times, time):
 
     """
     t = trip_times
-    return t[(t['start_time'] <= time) & (t['end_time'] > time)].shape[0]
+    return int(get_active_trip_counts(t['start_time'].values,
+      t['end_time'].values, [time])[0])
+
+def get_active_trip_counts(start_times, end_times, times):
+    """
+    Count the number of trips active at each of the given times.
+
+    Parameters
+    ----------
+    start_times : array
+        Start times of trips in seconds past midnight
+    end_times : array
+        End times of the same trips in seconds past midnight
+    times : array
+        Times in seconds past midnight at which to count active trips
+
+    Returns
+    -------
+    NumPy array
+        Integers; the ``i``th entry is the number of trips active at
+        ``times[i]``, where a trip is considered active at time t if
+        and only if start_time <= t < end_time.
+
+    Notes
+    -----
+    Sorts the start and end times once and binary searches them for
+    each time, instead of scanning all the trips for each time.
+    Trips with null start or end times are never active.
+
+    """
+    start_times = np.asarray(start_times, dtype=float)
+    end_times = np.asarray(end_times, dtype=float)
+    # Drop trips that can never be active, including those with null
+    # times, so that every remaining trip that has ended has also started
+    cond = start_times < end_times
+    starts = np.sort(start_times[cond])
+    ends = np.sort(end_times[cond])
+    times = np.asarray(times, dtype=float)
+    return np.searchsorted(starts, times, side='right') -\
+      np.searchsorted(ends, times, side='right')
+
+def get_active_trip_count_changes(start_times, end_times):
+    """
+    Sweep through the start and end times of the given trips to get
+    the times at which the number of active trips can change and the
+    number of trips active at those times.
+
+    Parameters
+    ----------
+    start_times : array
+        Start times of trips in seconds past midnight
+    end_times : array
+        End times of the same trips in seconds past midnight
+
+    Returns
+    -------
+    pair
+        Of NumPy arrays ``times, counts``, where ``times`` are the
+        distinct start and end times of the trips in increasing order
+        and ``counts[i]`` is the number of trips active at
+        ``times[i]``, where a trip is considered active at time t if
+        and only if start_time <= t < end_time.
+        Ignore trips with null start or end times and trips that do
+        not start before they end, since they are never active.
+
+    Notes
+    -----
+    Suitable input for :func:`get_peak_indices`, because the number
+    of active trips is constant between consecutive times.
+    Sums the +1 of each start and the -1 of each end at each time
+    before accumulating, so that the counts never reflect a trip
+    ending and another starting at the same time only partially.
+
+    """
+    start_times = np.asarray(start_times, dtype=float)
+    end_times = np.asarray(end_times, dtype=float)
+    cond = start_times < end_times
+    events = np.concatenate([start_times[cond], end_times[cond]])
+    deltas = np.repeat([1, -1], cond.sum())
+    times, inverse = np.unique(events, return_inverse=True)
+    counts = np.cumsum(np.bincount(inverse, weights=deltas,
+      minlength=times.size)).astype(int)
+    return times, counts
+
+def get_headway_stats(f, by, time_col, headway_start, headway_end,
+  agg_by=None):
+    """
+    Compute headway stats for groups of times.
+
+    Parameters
+    ----------
+    f : DataFrame
+        Contains the columns in ``by`` and ``time_col``
+    by : list
+        Column names; the times of each group of rows with the same
+        values in these columns form a sequence of departures
+    time_col : string
+        Name of a column of times in seconds past midnight
+    headway_start : integer
+        Start time in seconds past midnight for computing headways
+    headway_end : integer
+        End time in seconds past midnight for computing headways
+    agg_by : list
+        Column names contained in ``by`` by which to aggregate the
+        headways of the groups; defaults to ``by``
+
+    Returns
+    -------
+    DataFrame
+        Indexed by the values of ``agg_by`` and with the columns
+
+        - ``'max_headway'``: maximum of the durations (in minutes)
+          between consecutive times in a group that lie between
+          ``headway_start`` and ``headway_end`` inclusive
+        - ``'min_headway'``: minimum of those durations
+        - ``'mean_headway'``: mean of those durations
+
+        Groups without such durations are omitted.
+
+    Notes
+    -----
+    Sorts all the times once by group and time and takes the
+    differences of consecutive times within each group,
+    instead of sorting and differencing group by group.
+
+    """
+    if agg_by is None:
+        agg_by = by
+    cond = (f[time_col] >= headway_start) & (f[time_col] <= headway_end)
+    g = f.loc[cond, by + [time_col]].sort_values(by + [time_col])
+    # Keep differences between times of the same group only
+    is_same = (g[by] == g[by].shift()).all(axis=1)
+    headways = g[time_col].diff()[is_same]/60  # minutes
+    keys = [g.loc[is_same, col] for col in agg_by]
+    result = headways.groupby(keys).agg(['max', 'min', 'mean'])
+    return result.rename(columns=lambda x: x + '_headway')
 
 def combine_time_series(time_series_dict, kind, split_directions=False):
     """
@@ -270,7 +530,8 @@ def combine_time_series(time_series_dict, kind, split_directions=False):
     split_directions : boolean
         If ``True``, then assume the original time series contains data
         separated by trip direction; otherwise, assume not.
-        The separation is indicated by a suffix ``'-0'`` (direction 0)
+        The separation is indicated by two-level columns of route ID or
+        stop ID and direction ID, or by a suffix ``'-0'`` (direction 0)
         or ``'-1'`` (direction 1) in the route ID or stop ID column
         values.
 
@@ -308,10 +569,11 @@ def combine_time_series(time_series_dict, kind, split_directions=False):
     new_frames = []
     if split_directions:
         for f in frames:
-            ft = f.T
-            ft.index = pd.MultiIndex.from_tuples([process_index(k)
-              for (k, __) in ft.iterrows()])
-            new_frames.append(ft.T)
+            if not isinstance(f.columns, pd.MultiIndex):
+                f = f.copy()
+                f.columns = pd.MultiIndex.from_tuples([process_index(k)
+                  for k in f.columns])
+            new_frames.append(f)
     else:
         new_frames = frames
     result = pd.concat(new_frames, axis=1, keys=list(time_series_dict.keys()),
@@ -319,6 +581,23 @@ def combine_time_series(time_series_dict, kind, split_directions=False):
 
     return result
 
+def get_bin_width(freq):
+    """
+    Return the number of minutes in the given Pandas frequency string
+    (e.g. '15Min') if it is a whole number of minutes that evenly
+    divides a day; otherwise return 1.
+    Time series can be binned directly at such frequencies instead of
+    being binned by minute and downsampled.
+    """
+    try:
+        minutes = pd.tseries.frequencies.to_offset(freq).nanos/(60*10**9)
+    except ValueError:
+        return 1
+    if minutes >= 1 and minutes == int(minutes) and\
+      (24*60) % int(minutes) == 0:
+        return int(minutes)
+    return 1
+
 def downsample(time_series, freq):
     """
     Downsample the given route, stop, or feed time series,
@@ -330,50 +609,53 @@ def downsample(time_series, freq):
     shorter than the original frequency.
     """
 
-    f = time_series.copy()
+    # Sort the hierarchical columns to allow slicing and so that
+    # the indicators list their columns in the same order;
+    # see http://pandas.pydata.org/pandas-docs/stable/advanced.html#sorting-a-multiindex
+    f = time_series.sort_index(axis=1, sort_remaining=True)
 
     # Can't downsample to a shorter frequency
     if f.empty or pd.tseries.frequencies.to_offset(freq) < f.index.freq:
         return f
 
-    result = None
     if 'stop_id' in time_series.columns.names:
         # It's a stops time series
         result = f.resample(freq).sum()
     else:
         # It's a route or feed time series.
-        inds = [
-          'num_trips',
-          'num_trip_starts',
-          'num_trip_ends',
-          'service_distance',
-          'service_duration',
-          ]
-        frames = []
+        # Resample all indicators but num_trips by summing, skipping speed
+        f = f.drop('service_speed', axis=1, level=0, errors='ignore')
+        resampler = f.resample(freq)
+        result = resampler.sum()
+        values = result.values.copy()
+        indicators = result.columns.get_level_values(0)
 
-        # Resample num_trips in a custom way that depends on
-        # num_trips and num_trip_ends
-        def agg_num_trips(group):
-            return group['num_trips'].iloc[-1]\
-              + group['num_trip_ends'].iloc[:-1].sum()
-
-        num_trips = f.groupby(pd.TimeGrouper(freq)).apply(agg_num_trips)
-        frames.append(num_trips)
-
-        # Resample the rest of the indicators via summing
-        frames.extend(
-          [f[ind].resample(freq).agg('sum') for ind in inds[1:]])
-
-        g = pd.concat(frames, axis=1, keys=inds)
+        def get(indicator):
+            return indicators == indicator
 
-        # Calculate speed and add it to f. Can't resample it.
-        speed = g['service_distance']/g['service_duration']
-        speed = pd.concat({'service_speed': speed}, axis=1)
-        result = pd.concat([g, speed], axis=1)
-
-    # Reset column names and sort the hierarchical columns to allow slicing;
-    # see http://pandas.pydata.org/pandas-docs/stable/advanced.html#sorting-a-multiindex
+        # Resample num_trips in a custom way that depends on
+        # num_trips and num_trip_ends, namely as the number of trips in
+        # the last row of each bin plus the number of trips that end in
+        # the other rows of the bin
+        last = f.values[np.cumsum(resampler.size().values) - 1]
+        values[:, get('num_trips')] = last[:, get('num_trips')] +\
+          values[:, get('num_trip_ends')] - last[:, get('num_trip_ends')]
+
+        # Calculate speed and append it, which keeps the columns sorted.
+        # Can't resample it.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            speed = values[:, get('service_distance')]/\
+              values[:, get('service_duration')]
+        speed_columns = result[['service_distance']].rename(
+          columns={'service_distance': 'service_speed'}, level=0).columns
+        result = pd.DataFrame(np.hstack([values, speed]), index=result.index,
+          columns=result.columns.append(speed_columns))
+
+        # Keep integer indicators, namely the counts, as integers
+        int_columns = f.columns[[d.kind in 'iu' for d in f.dtypes]]
+        result = result.astype({c: np.int64 for c in int_columns})
+
+    # Reset column names
     result.columns.names = f.columns.names
-    result = result.sort_index(axis=1, sort_remaining=True)
 
     return result
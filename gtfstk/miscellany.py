@@ -251,13 +251,14 @@ def convert_dist(feed, new_dist_units):
 
     converter = hp.get_convert_dist(old_dist_units, new_dist_units)
 
+    # Convert whole columns at once rather than element by element
     if hp.is_not_null(feed.stop_times, 'shape_dist_traveled'):
         feed.stop_times['shape_dist_traveled'] =\
-          feed.stop_times['shape_dist_traveled'].map(converter)
+          converter(feed.stop_times['shape_dist_traveled'])
 
     if hp.is_not_null(feed.shapes, 'shape_dist_traveled'):
         feed.shapes['shape_dist_traveled'] =\
-          feed.shapes['shape_dist_traveled'].map(converter)
+          converter(feed.shapes['shape_dist_traveled'])
 
     return feed
 
@@ -328,8 +329,8 @@ def compute_feed_stats(feed, trip_stats, dates):
     stop_times = feed.stop_times.copy()
 
     # Convert timestrings to seconds for quicker calculations
-    ts[['start_time', 'end_time']] =\
-      ts[['start_time', 'end_time']].applymap(hp.timestr_to_seconds)
+    for col in ['start_time', 'end_time']:
+        ts[col] = hp.timestrs_to_seconds(ts[col])
 
     # Collect stats for each date, memoizing stats by trip ID sequence
     # to avoid unnecessary recomputations.
@@ -375,9 +376,9 @@ def compute_feed_stats(feed, trip_stats, dates):
             stats['service_speed'] =\
               stats['service_distance']/stats['service_duration']
 
-            # Compute peak stats, which is the slowest part
-            times = np.unique(f[['start_time', 'end_time']].values)
-            counts = [hp.count_active_trips(f, t) for t in times]
+            # Compute peak stats
+            times, counts = hp.get_active_trip_count_changes(
+              f['start_time'].values, f['end_time'].values)
             start, end = hp.get_peak_indices(times, counts)
             stats['peak_num_trips'] = counts[start]
             stats['peak_start_time'] = times[start]
@@ -397,8 +398,8 @@ def compute_feed_stats(feed, trip_stats, dates):
 
     # Convert seconds back to timestrings
     times = ['peak_start_time', 'peak_end_time']
-    f[times] = f[times].applymap(
-      lambda t: hp.timestr_to_seconds(t, inverse=True))
+    for col in times:
+        f[col] = hp.timestrs_to_seconds(f[col], inverse=True)
 
     return f
 
@@ -460,15 +461,16 @@ def compute_feed_time_series(feed, trip_stats, dates, freq='5Min'):
     if rts.empty:
         return pd.DataFrame()
 
-    cols = [
-      'num_trip_starts',
-      'num_trip_ends',
-      'num_trips',
-      'service_distance',
-      'service_duration',
-      'service_speed',
-    ]
-    f = pd.concat([rts[col].sum(axis=1) for col in cols], axis=1, keys=cols)
+    # Sum over routes for all indicators in one pass, keeping nulls
+    # for times without any service
+    f = rts.groupby(level='indicator', axis=1).sum()
+    f = f.where(rts.notnull().groupby(level='indicator', axis=1).sum() > 0)
+    f.columns.name = None
+
+    # Keep integer indicators, namely the counts, as integers
+    is_int = rts.dtypes.map(lambda d: d.kind in 'iu').groupby(
+      level='indicator').all()
+    f = f.astype({c: np.int64 for c in is_int.index[is_int]})
     f['service_speed'] = f['service_distance']/f['service_duration']
 
     return f.sort_index(axis=1)
@@ -507,19 +509,24 @@ def create_shapes(feed, all_trips=False):
         # Nothing to do
         return feed
 
+    # Get the stop sequence of each trip, slicing the stop IDs by
+    # trip rather than materializing a DataFrame for each trip
+    stop_ids = f['stop_id'].values
+    stop_seq_by_trip = {trip: tuple(stop_ids[indices])
+      for trip, indices in f.groupby('trip_id').indices.items()}
+
     # Create new shape IDs for given trips.
     # To do this, collect unique stop sequences,
     # sort them to impose a canonical order, and
     # assign shape IDs to them
-    stop_seqs = sorted(set(tuple(group['stop_id'].values)
-      for trip, group in f.groupby('trip_id')))
+    stop_seqs = sorted(set(stop_seq_by_trip.values()))
     d = int(math.log10(len(stop_seqs))) + 1  # Digits for padding shape IDs
     shape_by_stop_seq = {seq: 'shape_{num:0{pad}d}'.format(num=i, pad=d)
       for i, seq in enumerate(stop_seqs)}
 
     # Assign these new shape IDs to given trips
-    shape_by_trip = {trip: shape_by_stop_seq[tuple(group['stop_id'].values)]
-      for trip, group in f.groupby('trip_id')}
+    shape_by_trip = {trip: shape_by_stop_seq[stop_seq]
+      for trip, stop_seq in stop_seq_by_trip.items()}
     trip_cond = feed.trips['trip_id'].isin(trip_ids)
     feed.trips.loc[trip_cond, 'shape_id'] = feed.trips.loc[trip_cond,
       'trip_id'].map(lambda x: shape_by_trip[x])
@@ -850,7 +857,7 @@ def compute_screen_line_counts(feed, linestring, dates, geo_shapes=None):
 
     # Drop NaN departure times and convert to seconds past midnight
     t = t[t['departure_time'].notnull()].copy()
-    t['departure_time'] = t['departure_time'].map(hp.timestr_to_seconds)
+    t['departure_time'] = hp.timestrs_to_seconds(t['departure_time'])
 
     # Compile crossings by date
     a = feed.compute_trip_activity(dates)
@@ -889,7 +896,7 @@ def compute_screen_line_counts(feed, linestring, dates, geo_shapes=None):
     g = pd.DataFrame(rows, columns=cols).sort_values(['date', 'crossing_time'])
 
     # Convert departure times back to time strings
-    g['crossing_time'] = g['crossing_time'].map(
-      lambda x: hp.timestr_to_seconds(x, inverse=True))
+    g['crossing_time'] = hp.timestrs_to_seconds(g['crossing_time'],
+      inverse=True)
 
     return g
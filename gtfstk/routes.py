@@ -93,111 +93,68 @@ def compute_route_stats_base(trip_stats_subset, split_directions=False,
 
     # Convert trip start and end times to seconds to ease calculations below
     f = trip_stats_subset.copy()
-    f[['start_time', 'end_time']] = f[['start_time', 'end_time']
-      ].applymap(hp.timestr_to_seconds)
+    for col in ['start_time', 'end_time']:
+        f[col] = hp.timestrs_to_seconds(f[col])
 
     headway_start = hp.timestr_to_seconds(headway_start_time)
     headway_end = hp.timestr_to_seconds(headway_end_time)
 
-    def compute_route_stats_split_directions(group):
-        # Take this group of all trips stats for a single route
-        # and compute route-level stats.
-        d = OrderedDict()
-        d['route_short_name'] = group['route_short_name'].iat[0]
-        d['route_type'] = group['route_type'].iat[0]
-        d['num_trips'] = group.shape[0]
-        d['num_trip_starts'] = group['start_time'].count()
-        d['num_trip_ends'] = group.loc[
-          group['end_time'] < 24*3600, 'end_time'].count()
-        d['is_loop'] = int(group['is_loop'].any())
-        d['start_time'] = group['start_time'].min()
-        d['end_time'] = group['end_time'].max()
-
-        # Compute max and mean headway
-        stimes = group['start_time'].values
-        stimes = sorted([stime for stime in stimes
-          if headway_start <= stime <= headway_end])
-        headways = np.diff(stimes)
-        if headways.size:
-            d['max_headway'] = np.max(headways)/60  # minutes
-            d['min_headway'] = np.min(headways)/60  # minutes
-            d['mean_headway'] = np.mean(headways)/60  # minutes
-        else:
-            d['max_headway'] = np.nan
-            d['min_headway'] = np.nan
-            d['mean_headway'] = np.nan
-
-        # Compute peak num trips
-        times = np.unique(group[['start_time', 'end_time']].values)
-        counts = [hp.count_active_trips(group, t) for t in times]
-        start, end = hp.get_peak_indices(times, counts)
-        d['peak_num_trips'] = counts[start]
-        d['peak_start_time'] = times[start]
-        d['peak_end_time'] = times[end]
-
-        d['service_distance'] = group['distance'].sum()
-        d['service_duration'] = group['duration'].sum()
-        return pd.Series(d)
-
-    def compute_route_stats(group):
-        d = OrderedDict()
-        d['route_short_name'] = group['route_short_name'].iat[0]
-        d['route_type'] = group['route_type'].iat[0]
-        d['num_trips'] = group.shape[0]
-        d['num_trip_starts'] = group['start_time'].count()
-        d['num_trip_ends'] = group.loc[
-          group['end_time'] < 24*3600, 'end_time'].count()
-        d['is_loop'] = int(group['is_loop'].any())
-        d['is_bidirectional'] = int(group['direction_id'].unique().size > 1)
-        d['start_time'] = group['start_time'].min()
-        d['end_time'] = group['end_time'].max()
-
-        # Compute headway stats
-        headways = np.array([])
-        for direction in [0, 1]:
-            stimes = group[group['direction_id'] == direction][
-              'start_time'].values
-            stimes = sorted([stime for stime in stimes
-              if headway_start <= stime <= headway_end])
-            headways = np.concatenate([headways, np.diff(stimes)])
-        if headways.size:
-            d['max_headway'] = np.max(headways)/60  # minutes
-            d['min_headway'] = np.min(headways)/60  # minutes
-            d['mean_headway'] = np.mean(headways)/60  # minutes
-        else:
-            d['max_headway'] = np.nan
-            d['min_headway'] = np.nan
-            d['mean_headway'] = np.nan
-
-        # Compute peak num trips
-        times = np.unique(group[['start_time', 'end_time']].values)
-        counts = [hp.count_active_trips(group, t) for t in times]
+    # Compute the stats for all routes (or route directions) at once
+    if split_directions:
+        by = ['route_id', 'direction_id']
+    else:
+        by = ['route_id']
+    grouped = f.groupby(by)
+    first = f.drop_duplicates(by).set_index(by).reindex(
+      grouped.size().index)
+    d = OrderedDict()
+    d['route_short_name'] = first['route_short_name']
+    d['route_type'] = first['route_type']
+    d['num_trips'] = grouped.size()
+    d['num_trip_starts'] = grouped['start_time'].count()
+    d['num_trip_ends'] = (f['end_time'] < 24*3600).groupby(
+      [f[col] for col in by]).sum()
+    d['is_loop'] = grouped['is_loop'].any().astype(int)
+    if not split_directions:
+        d['is_bidirectional'] = (grouped['direction_id'].nunique(
+          dropna=False) > 1).astype(int)
+    d['start_time'] = grouped['start_time'].min()
+    d['end_time'] = grouped['end_time'].max()
+    g = pd.DataFrame(d)
+
+    # Compute headway stats.
+    # Headways are always computed for each direction separately.
+    if split_directions:
+        headway_stats = hp.get_headway_stats(f,
+          ['route_id', 'direction_id'], 'start_time', headway_start,
+          headway_end)
+    else:
+        headway_stats = hp.get_headway_stats(
+          f[f['direction_id'].isin([0, 1])], ['route_id', 'direction_id'],
+          'start_time', headway_start, headway_end, agg_by=['route_id'])
+    g = g.join(headway_stats)
+
+    # Compute peak num trips
+    start_times = f['start_time'].values
+    end_times = f['end_time'].values
+
+    def get_peak(indices):
+        times, counts = hp.get_active_trip_count_changes(
+          start_times[indices], end_times[indices])
         start, end = hp.get_peak_indices(times, counts)
-        d['peak_num_trips'] = counts[start]
-        d['peak_start_time'] = times[start]
-        d['peak_end_time'] = times[end]
+        return counts[start], times[start], times[end]
 
-        d['service_distance'] = group['distance'].sum()
-        d['service_duration'] = group['duration'].sum()
+    g['peak_num_trips'], g['peak_start_time'], g['peak_end_time'] = zip(
+      *[get_peak(grouped.indices[key]) for key in g.index])
 
-        return pd.Series(d)
+    g['service_distance'] = grouped['distance'].sum()
+    g['service_duration'] = grouped['duration'].sum()
+    g = g.reset_index()
 
     if split_directions:
-        g = f.groupby(['route_id', 'direction_id']).apply(
-          compute_route_stats_split_directions).reset_index()
-
         # Add the is_bidirectional column
-        def is_bidirectional(group):
-            d = {}
-            d['is_bidirectional'] = int(
-              group['direction_id'].unique().size > 1)
-            return pd.Series(d)
-
-        gg = g.groupby('route_id').apply(is_bidirectional).reset_index()
-        g = g.merge(gg)
-    else:
-        g = f.groupby('route_id').apply(
-          compute_route_stats).reset_index()
+        g['is_bidirectional'] = (g.groupby('route_id')['direction_id'
+          ].transform('nunique') > 1).astype(int)
 
     # Compute a few more stats
     g['service_speed'] = g['service_distance']/g['service_duration']
@@ -205,9 +162,8 @@ def compute_route_stats_base(trip_stats_subset, split_directions=False,
     g['mean_trip_duration'] = g['service_duration']/g['num_trips']
 
     # Convert route times to time strings
-    g[['start_time', 'end_time', 'peak_start_time', 'peak_end_time']] =\
-      g[['start_time', 'end_time', 'peak_start_time', 'peak_end_time']].\
-      applymap(lambda x: hp.timestr_to_seconds(x, inverse=True))
+    for col in ['start_time', 'end_time', 'peak_start_time', 'peak_end_time']:
+        g[col] = hp.timestrs_to_seconds(g[col], inverse=True)
 
     return g
 
@@ -272,8 +228,10 @@ def compute_route_time_series_base(trip_stats_subset, date_label='20010101',
 
     Notes
     -----
-    - The time series is computed at a one-minute frequency, then
-      resampled at the end to the given frequency
+    - The time series is computed at the given frequency if it is a
+      whole number of minutes that evenly divides a day; otherwise it
+      is computed at a one-minute frequency, then resampled at the end
+      to the given frequency
     - Trips that lack start or end times are ignored, so the the
       aggregate ``num_trips`` across the day could be less than the
       ``num_trips`` column of :func:`compute_route_stats_base`
@@ -297,12 +255,11 @@ def compute_route_time_series_base(trip_stats_subset, date_label='20010101',
 
     tss = trip_stats_subset.copy()
     if split_directions:
-        # Alter route IDs to encode direction:
-        # <route ID>-0 and <route ID>-1
-        tss['route_id'] = tss['route_id'] + '-' +\
-          tss['direction_id'].map(str)
+        # Make one time series per route ID and direction ID pair
+        by = ['route_id', 'direction_id']
+    else:
+        by = ['route_id']
 
-    routes = tss['route_id'].unique()
     # Build a dictionary of time series and then merge them all
     # at the end.
     # Assign a uniform generic date for the index
@@ -318,59 +275,98 @@ def compute_route_time_series_base(trip_stats_subset, date_label='20010101',
       'service_distance',
     ]
 
-    bins = [i for i in range(24*60)]  # One bin for each minute
-    num_bins = len(bins)
-
-    # Bin start and end times
-    def F(x):
-        return (hp.timestr_to_seconds(x)//60) % (24*60)
-
-    tss[['start_index', 'end_index']] = tss[['start_time', 'end_time']
-      ].applymap(F)
-    routes = sorted(set(tss['route_id'].values))
-
-    # Bin each trip according to its start and end time and weight
-    series_by_route_by_indicator = {indicator:
-      {route: [0 for i in range(num_bins)] for route in routes}
-      for indicator in indicators}
-    for index, row in tss.iterrows():
-        route = row['route_id']
-        start = row['start_index']
-        end = row['end_index']
-        distance = row['distance']
-
-        if start is None or np.isnan(start) or start == end:
-            continue
-
-        # Get bins to fill
-        if start <= end:
-            bins_to_fill = bins[start:end]
-        else:
-            bins_to_fill = bins[start:] + bins[:end]
-
-        # Bin trip
-        # Do num trip starts
-        series_by_route_by_indicator['num_trip_starts'][route][start] += 1
-        # Don't mark trip ends for trips that run past midnight;
-        # allows for easy resampling of num_trips later
-        if start <= end:
-            series_by_route_by_indicator['num_trip_ends'][route][end] += 1
-        # Do rest of indicators
-        for indicator in indicators[2:]:
-            if indicator == 'num_trips':
-                weight = 1
-            elif indicator == 'service_duration':
-                weight = 1/60
-            else:
-                weight = distance/len(bins_to_fill)
-            for bin in bins_to_fill:
-                series_by_route_by_indicator[indicator][route][bin] += weight
+    num_minutes = 24*60
+
+    # Get start and end minutes
+    for t, i in [('start_time', 'start_index'), ('end_time', 'end_index')]:
+        tss[i] = (hp.timestrs_to_seconds(tss[t])//60) % num_minutes
+    r = tss[by].drop_duplicates().sort_values(by)
+    routes = pd.MultiIndex.from_arrays([r[c].values for c in by], names=by)
+    if not split_directions:
+        routes = routes.get_level_values(0)
+
+    # Ignore trips lacking start or end times or lasting under a minute
+    tss = tss[tss['start_index'].notnull() & tss['end_index'].notnull() &
+      (tss['start_index'] != tss['end_index'])]
+    route_indices = routes.get_indexer(
+      pd.MultiIndex.from_arrays([tss[c].values for c in by])
+      if split_directions
+      else tss['route_id'])
+    starts = tss['start_index'].values.astype(int)
+    ends = tss['end_index'].values.astype(int)
+    lengths = (ends - starts) % num_minutes
+
+    # Bin directly at the given frequency when possible,
+    # so that downsampling has nothing left to aggregate.
+    # A trip with a null distance nullifies the service distance of its
+    # route in each minute it runs, so if only some trips have null
+    # distances, then bin by minute to nullify the right minutes.
+    width = hp.get_bin_width(freq)  # Minutes per bin
+    is_null = tss['distance'].isnull()
+    if is_null.any() and not is_null.all():
+        width = 1
+    num_bins = num_minutes//width
+    wraps = starts > ends
+
+    # Split the trips that run past midnight into two spans of minutes,
+    # so that each span [span_starts, span_ends) lies within the day
+    spans = np.r_[np.arange(starts.size), np.flatnonzero(wraps)]
+    span_starts = np.r_[starts, np.zeros(wraps.sum(), dtype=int)]
+    span_ends = np.r_[np.where(wraps, num_minutes, ends), ends[wraps]]
+
+    def expand(lo, hi):
+        # Return the index and bin of each bin in the bin ranges [lo, hi)
+        counts = hi - lo
+        indices = np.repeat(np.arange(lo.size), counts)
+        bins = lo[indices] + np.arange(indices.size) - np.repeat(
+          np.cumsum(counts) - counts, counts)
+        return indices, bins
+
+    def bin_trips(trips, bins, weights=None):
+        return np.bincount(route_indices[trips]*num_bins + bins,
+          weights=weights, minlength=len(routes)*num_bins).reshape(
+          len(routes), num_bins)
+
+    # Get the number of minutes each span spends in each bin it touches
+    indices, bins = expand(span_starts//width,
+      (span_ends - 1)//width + 1)
+    minutes = np.minimum(span_ends[indices], (bins + 1)*width) -\
+      np.maximum(span_starts[indices], bins*width)
+    trips = spans[indices]
+
+    # A trip counts towards num_trips in a bin if it is in service
+    # during the last minute of the bin or if it ends earlier in the bin,
+    # as when downsampling minute counts
+    indices, num_trips_bins = expand(span_starts//width, span_ends//width)
+    ends_early = ~wraps & (ends % width != width - 1)
+    num_trips_trips = np.r_[spans[indices], np.flatnonzero(ends_early)]
+    num_trips_bins = np.r_[num_trips_bins, ends[ends_early]//width]
+
+    # Bin each trip according to its start and end time and weight.
+    # Don't mark trip ends for trips that run past midnight;
+    # allows for easy resampling of num_trips later.
+    arrays_by_indicator = {
+      'num_trip_starts': bin_trips(np.arange(starts.size),
+        starts//width),
+      'num_trip_ends': bin_trips(np.flatnonzero(~wraps),
+        ends[~wraps]//width),
+      'num_trips': bin_trips(num_trips_trips, num_trips_bins),
+      'service_duration': bin_trips(trips, bins, minutes/60),
+      'service_distance': bin_trips(trips, bins,
+        minutes*(tss['distance'].values/lengths)[trips]),
+      }
+
+    # Only trips with null distances produce null values.
+    # Zero them out in place rather than filling every time series.
+    a = arrays_by_indicator['service_distance']
+    a[np.isnan(a)] = 0
 
     # Create one time series per indicator
-    rng = pd.date_range(date_str, periods=24*60, freq='Min')
+    rng = pd.date_range(date_str, periods=num_bins,
+      freq='{!s}Min'.format(width))
     series_by_indicator = {indicator:
-      pd.DataFrame(series_by_route_by_indicator[indicator],
-        index=rng).fillna(0)
+      pd.DataFrame(arrays_by_indicator[indicator].T, index=rng,
+        columns=routes)
       for indicator in indicators}
 
     # Combine all time series into one time series
@@ -626,6 +622,9 @@ def compute_route_time_series(feed, trip_stats, dates, split_directions=False,
             t = ts[ts['trip_id'].isin(ids)].copy()
             stats = compute_route_time_series_base(t,
               split_directions=split_directions, freq=freq, date_label=date)
+            if stats.empty:
+                # None of the trips has stats, so use null stats
+                stats = null_stats
 
             # Remember stats
             stats_and_dates_by_ids[ids] = [stats, [date]]
@@ -635,10 +634,9 @@ def compute_route_time_series(feed, trip_stats, dates, split_directions=False,
     for stats, dates_ in stats_and_dates_by_ids.values():
         for date in dates_:
             f = stats.copy()
-            # Replace date
-            d = hp.datestr_to_date(date)
-            f.index = f.index.map(lambda t: t.replace(
-              year=d.year, month=d.month, day=d.day))
+            # Replace date, keeping the times of day
+            f.index = pd.to_datetime(date) + (
+              f.index - f.index.normalize())
             frames.append(f)
 
     f = pd.concat(frames).sort_index().sort_index(axis=1, sort_remaining=True)
@@ -696,22 +694,23 @@ def build_route_timetable(feed, route_id, dates):
     t = t[t['route_id'] == route_id].copy()
     a = feed.compute_trip_activity(dates)
 
+    # Get the minimum departure time of each trip once for all dates,
+    # ignoring NaN departure times, so that trips can be sorted by it
+    s = t[t['departure_time'].notnull()]
+    t['min_dt'] = t['trip_id'].map(
+      s.groupby('trip_id')['departure_time'].min())
+
     frames = []
     for date in dates:
         # Slice to trips active on date
         ids = a.loc[a[date] == 1, 'trip_id']
         f = t[t['trip_id'].isin(ids)].copy()
         f['date'] = date
-        # Groupby trip ID and sort groups by their minimum departure time.
-        # For some reason NaN departure times mess up the transform below.
-        # So temporarily fill NaN departure times as a workaround.
-        f['dt'] = f['departure_time'].fillna(method='ffill')
-        f['min_dt'] = f.groupby('trip_id')['dt'].transform(min)
         frames.append(f)
 
     f = pd.concat(frames)
     return f.sort_values(['date', 'min_dt', 'stop_sequence']).drop(
-      ['min_dt', 'dt'], axis=1)
+      'min_dt', axis=1)
 
 def route_to_geojson(feed, route_id, include_stops=False):
     """
@@ -769,11 +768,12 @@ def route_to_geojson(feed, route_id, include_stops=False):
         s = s[list(cols)].copy()
         stop_ids = s['stop_id'].tolist()
         geometry_by_stop = feed.build_geometry_by_stop(stop_ids=stop_ids)
+        # Encode all stop properties in one pass
+        properties = json.loads(s.to_json(orient='records'))
         features.extend([{
             'type': 'Feature',
-            'properties': json.loads(s[s['stop_id'] == stop_id].to_json(
-              orient='records'))[0],
+            'properties': props,
             'geometry': sg.mapping(geometry_by_stop[stop_id]),
-        } for stop_id in stop_ids])
+        } for stop_id, props in zip(stop_ids, properties)])
 
     return {'type': 'FeatureCollection', 'features': features}
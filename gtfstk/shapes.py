@@ -3,7 +3,6 @@ Functions about shapes.
 """
 import pandas as pd
 import numpy as np
-import utm
 import shapely.geometry as sg
 
 from . import constants as cs
@@ -38,28 +37,22 @@ def build_geometry_by_shape(feed, use_utm=False, shape_ids=None):
     if feed.shapes is None:
         return {}
 
-    # Note the output for conversion to UTM with the utm package:
-    # >>> u = utm.from_latlon(47.9941214, 7.8509671)
-    # >>> print u
-    # (414278, 5316285, 32, 'T')
-    d = {}
-    shapes = feed.shapes.copy()
+    shapes = feed.shapes
     if shape_ids is not None:
         shapes = shapes[shapes['shape_id'].isin(shape_ids)]
 
+    # Get the coordinates of all the shape points as one array,
+    # converting them to UTM all at once if necessary,
+    # then slice it by shape
+    lons = shapes['shape_pt_lon'].values
+    lats = shapes['shape_pt_lat'].values
     if use_utm:
-        for shape, group in shapes.groupby('shape_id'):
-            lons = group['shape_pt_lon'].values
-            lats = group['shape_pt_lat'].values
-            xys = [utm.from_latlon(lat, lon)[:2]
-              for lat, lon in zip(lats, lons)]
-            d[shape] = sg.LineString(xys)
+        coords = hp.latlons_to_utm(lats, lons)
     else:
-        for shape, group in shapes.groupby('shape_id'):
-            lons = group['shape_pt_lon'].values
-            lats = group['shape_pt_lat'].values
-            lonlats = zip(lons, lats)
-            d[shape] = sg.LineString(lonlats)
+        coords = np.column_stack([lons, lats])
+
+    d = {shape: sg.LineString(coords[indices])
+      for shape, indices in shapes.groupby('shape_id').indices.items()}
     return d
 
 def shapes_to_geojson(feed):
@@ -155,28 +148,29 @@ def append_dist_to_shapes(feed):
     f = feed.shapes
     m_to_dist = hp.get_convert_dist('m', feed.dist_units)
 
-    def compute_dist(group):
-        # Compute the distances of the stops along this trip
-        group = group.sort_values('shape_pt_sequence')
-        shape = group['shape_id'].iat[0]
-        if not isinstance(shape, str):
-            group['shape_dist_traveled'] = np.nan
-            return group
-        points = [sg.Point(utm.from_latlon(lat, lon)[:2])
-          for lon, lat in group[['shape_pt_lon', 'shape_pt_lat']].values]
-        p_prev = points[0]
-        d = 0
-        distances = [0]
-        for p in points[1:]:
-            d += p.distance(p_prev)
-            distances.append(d)
-            p_prev = p
-        group['shape_dist_traveled'] = distances
-        return group
-
-    g = f.groupby('shape_id', group_keys=False).apply(compute_dist)
+    # Sort the shape points and convert them to UTM all at once
+    g = f[f['shape_id'].notnull()].sort_values(['shape_id',
+      'shape_pt_sequence'], kind='mergesort')
+    coords = hp.latlons_to_utm(g['shape_pt_lat'].values,
+      g['shape_pt_lon'].values)
+
+    # Accumulate the distances between consecutive points of each shape
+    dists = np.zeros(g.shape[0])
+    dists[1:] = np.sqrt((np.diff(coords, axis=0)**2).sum(axis=1))
+    shapes = g['shape_id'].values
+    starts = np.flatnonzero(np.r_[True, shapes[1:] != shapes[:-1]])
+    for start, end in zip(starts, np.r_[starts[1:], shapes.size]):
+        dists[start] = 0
+        dists[start:end] = np.cumsum(dists[start:end])
+    dists = pd.Series(dists, index=g.index)
+
+    # Skip shape IDs that are not strings
+    is_str = g['shape_id'].isin([shape for shape in g['shape_id'].unique()
+      if isinstance(shape, str)])
+    g['shape_dist_traveled'] = dists.where(is_str)
+
     # Convert from meters
-    g['shape_dist_traveled'] = g['shape_dist_traveled'].map(m_to_dist)
+    g['shape_dist_traveled'] = m_to_dist(g['shape_dist_traveled'])
 
     feed.shapes = g
     return feed
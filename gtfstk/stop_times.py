@@ -3,6 +3,11 @@ Functions about stop times.
 """
 import pandas as pd
 import numpy as np
+try:
+    # Vectorized geometry function of Shapely 2
+    from shapely import line_locate_point
+except ImportError:
+    line_locate_point = None
 
 from . import helpers as hp
 
@@ -59,8 +64,9 @@ def append_dist_to_stop_times(feed, trip_stats):
 
       Get the average speed of the trip via ``trip_stats`` and use is to
       linearly interpolate distances for stop times, assuming that the
-      first stop is at shape_dist_traveled = 0 (the start of the shape)
-      and the last stop is at shape_dist_traveled = the length of the trip
+      first stop with a departure time is at shape_dist_traveled = 0
+      (the start of the shape) and the last stop with a departure time is
+      at shape_dist_traveled = the length of the trip
       (taken from trip_stats and equal to the length of the shape, unless
       ``trip_stats`` was called with ``get_dist_from_shapes == False``).
       This fallback method usually kicks in on trips with
@@ -86,66 +92,81 @@ def append_dist_to_stop_times(feed, trip_stats):
       trip_stats[['trip_id', 'shape_id', 'distance', 'duration']]
       ).sort_values(['trip_id', 'stop_sequence'])
 
-    # Convert departure times to seconds past midnight to ease calculations
-    f['departure_time'] = f['departure_time'].map(hp.timestr_to_seconds)
-    dist_by_stop_by_shape = {shape: {} for shape in geometry_by_shape}
+    # Get departure times in seconds past midnight to ease calculations,
+    # leaving the departure time strings as they are
+    departure_times = hp.timestrs_to_seconds(f['departure_time']).values
     m_to_dist = hp.get_convert_dist('m', feed.dist_units)
 
-    def compute_dist(group):
-        # Compute the distances of the stops along this trip
-        shape = group['shape_id'].iat[0]
-        if not isinstance(shape, str):
-            group['shape_dist_traveled'] = np.nan
-            return group
-        elif np.isnan(group['distance'].iat[0]):
-            group['shape_dist_traveled'] = np.nan
-            return group
+    # Compute the distance of each stop along each shape only once,
+    # projecting all the stops of a shape onto its linestring at once
+    k = f[['shape_id', 'stop_id']].drop_duplicates()
+    k = k[k['shape_id'].isin(geometry_by_shape) &
+      k['stop_id'].isin(geometry_by_stop)]
+    dists = np.full(k.shape[0], np.nan)
+    stops = k['stop_id'].values
+    for shape, indices in k.groupby('shape_id').indices.items():
         linestring = geometry_by_shape[shape]
-        distances = []
-        for stop in group['stop_id'].values:
-            if stop in dist_by_stop_by_shape[shape]:
-                d = dist_by_stop_by_shape[shape][stop]
-            else:
-                d = m_to_dist(hp.get_segment_length(linestring,
-                  geometry_by_stop[stop]))
-                dist_by_stop_by_shape[shape][stop] = d
-            distances.append(d)
-        s = sorted(distances)
-        D = linestring.length
-        distances_are_reasonable = all([d < D + 100 for d in distances])
-        if distances_are_reasonable and s == distances:
-            # Good
-            pass
-        elif distances_are_reasonable and s == distances[::-1]:
-            # Reverse. This happens when the direction of a linestring
-            # opposes the direction of the bus trip.
-            distances = distances[::-1]
+        points = [geometry_by_stop[stop] for stop in stops[indices]]
+        if line_locate_point is not None:
+            dists[indices] = line_locate_point(linestring, points)
         else:
-            # Totally redo using trip length, first and last stop times,
-            # and linear interpolation
-            dt = group['departure_time']
-            times = dt.values  # seconds
-            t0, t1 = times[0], times[-1]
-            d0, d1 = 0, group['distance'].iat[0]
-            # Get indices of nan departure times and
-            # temporarily forward fill them
-            # for the purposes of using np.interp smoothly
-            nan_indices = np.where(dt.isnull())[0]
-            dt.fillna(method='ffill')
-            # Interpolate
-            distances = np.interp(times, [t0, t1], [d0, d1])
-            # Nullify distances with nan departure times
-            for i in nan_indices:
-                distances[i] = np.nan
-
-        group['shape_dist_traveled'] = distances
-        return group
-
-    g = f.groupby('trip_id', group_keys=False).apply(compute_dist)
-    # Convert departure times back to time strings
-    g['departure_time'] = g['departure_time'].map(lambda x:
-      hp.timestr_to_seconds(x, inverse=True))
-    g = g.drop(['shape_id', 'distance', 'duration'], axis=1)
+            dists[indices] = [linestring.project(p) for p in points]
+    dists = pd.Series(m_to_dist(dists), index=pd.MultiIndex.from_arrays(
+      [k['shape_id'].values, k['stop_id'].values]))
+    f['shape_dist_traveled'] = dists.reindex(pd.MultiIndex.from_arrays(
+      [f['shape_id'].values, f['stop_id'].values])).values
+
+    # Check the distances of each trip, which is a block of rows of f
+    trips = f['trip_id']
+    d = f['shape_dist_traveled']
+    D = f['shape_id'].map({shape: linestring.length
+      for shape, linestring in geometry_by_shape.items()})
+    distances_are_reasonable = (d < D + 100).groupby(trips).transform('all')
+    diffs = d.groupby(trips).diff()
+    is_increasing = ~(diffs < 0).groupby(trips).transform('any')
+    is_decreasing = ~(diffs > 0).groupby(trips).transform('any')
+    is_null = ~f['shape_id'].isin([shape for shape in
+      f['shape_id'].unique() if isinstance(shape, str)]) |\
+      f['distance'].isnull()
+    distances = d.values.copy()
+    distances[is_null.values] = np.nan
+
+    # Reverse the distances of trips whose distances decrease.
+    # This happens when the direction of a linestring
+    # opposes the direction of the bus trip.
+    cond = (distances_are_reasonable & ~is_increasing & is_decreasing &
+      ~is_null).values
+    position = trips.groupby(trips).cumcount().values
+    size = trips.groupby(trips).transform('size').values
+    mirror = np.arange(f.shape[0]) - 2*position + size - 1
+    distances[cond] = d.values[mirror[cond]]
+
+    # Totally redo the other trips using trip length, first and last
+    # stop times, and linear interpolation.
+    # Do so in one pass over all their rows, which form whole trips.
+    cond = (~(distances_are_reasonable & (is_increasing | is_decreasing)) &
+      ~is_null).values
+    # Take the first and last non-null departure times of each trip,
+    # so that null end times don't nullify whole trips.
+    redo = np.flatnonzero(cond)
+    times = departure_times[redo].astype(float)  # seconds
+    grouped = pd.Series(times).groupby(trips.values[redo])
+    t0 = grouped.transform('first').values
+    t1 = grouped.transform('last').values
+    d1 = f['distance'].values[redo]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dists = d1/(t1 - t0)*(times - t0)
+    # Set the endpoint values like np.interp does,
+    # nullifying distances with nan departure times
+    dists = np.where(times == t0, 0, dists)
+    dists = np.where(times == t1, d1, dists)
+    dists = np.where(times < t0, 0, dists)
+    dists = np.where(times > t1, d1, dists)
+    dists[np.isnan(times)] = np.nan
+    distances[redo] = dists
+
+    f['shape_dist_traveled'] = distances
+    g = f.drop(['shape_id', 'distance', 'duration'], axis=1)
     feed.stop_times = g
 
     return feed
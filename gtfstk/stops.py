@@ -1,11 +1,10 @@
 """
 Functions about stops.
 """
-from collections import Counter, OrderedDict
+from collections import OrderedDict
 
 import pandas as pd
 import numpy as np
-import utm
 import shapely.geometry as sg
 
 from . import constants as cs
@@ -69,44 +68,29 @@ def compute_stop_stats_base(stop_times, trip_subset, split_directions=False,
     f = pd.merge(stop_times, trip_subset)
 
     # Convert departure times to seconds to ease headway calculations
-    f['departure_time'] = f['departure_time'].map(hp.timestr_to_seconds)
+    f['departure_time'] = hp.timestrs_to_seconds(f['departure_time'])
 
     headway_start = hp.timestr_to_seconds(headway_start_time)
     headway_end = hp.timestr_to_seconds(headway_end_time)
 
-    # Compute stats for each stop
-    def compute_stop_stats(group):
-        # Operate on the group of all stop times for an individual stop
-        d = OrderedDict()
-        d['num_routes'] = group['route_id'].unique().size
-        d['num_trips'] = group.shape[0]
-        d['start_time'] = group['departure_time'].min()
-        d['end_time'] = group['departure_time'].max()
-        headways = []
-        dtimes = sorted([dtime for dtime in group['departure_time'].values
-          if headway_start <= dtime <= headway_end])
-        headways.extend([dtimes[i + 1] - dtimes[i]
-          for i in range(len(dtimes) - 1)])
-        if headways:
-            d['max_headway'] = np.max(headways)/60  # minutes
-            d['min_headway'] = np.min(headways)/60  # minutes
-            d['mean_headway'] = np.mean(headways)/60  # minutes
-        else:
-            d['max_headway'] = np.nan
-            d['min_headway'] = np.nan
-            d['mean_headway'] = np.nan
-        return pd.Series(d)
-
+    # Compute stats for all stops at once
     if split_directions:
-        g = f.groupby(['stop_id', 'direction_id'])
+        by = ['stop_id', 'direction_id']
     else:
-        g = f.groupby('stop_id')
-
-    result = g.apply(compute_stop_stats).reset_index()
+        by = ['stop_id']
+    g = f.groupby(by)
+    result = pd.DataFrame(OrderedDict([
+      ('num_routes', g['route_id'].nunique()),
+      ('num_trips', g.size()),
+      ('start_time', g['departure_time'].min()),
+      ('end_time', g['departure_time'].max()),
+      ]))
+    result = result.join(hp.get_headway_stats(f, by, 'departure_time',
+      headway_start, headway_end)).reset_index()
 
     # Convert start and end times to time strings
-    result[['start_time', 'end_time']] = result[['start_time', 'end_time']
-      ].applymap(lambda x: hp.timestr_to_seconds(x, inverse=True))
+    for col in ['start_time', 'end_time']:
+        result[col] = hp.timestrs_to_seconds(result[col], inverse=True)
 
     return result
 
@@ -154,8 +138,10 @@ def compute_stop_time_series_base(stop_times, trip_subset,
 
     Notes
     -----
-    - The time series is computed at a one-minute frequency, then
-      resampled at the end to the given frequency
+    - The time series is computed at the given frequency if it is a
+      whole number of minutes that evenly divides a day; otherwise it
+      is computed at a one-minute frequency, then resampled at the end
+      to the given frequency
     - Stop times with null departure times are ignored, so the aggregate
       of ``num_trips`` across the day could be less than the
       ``num_trips`` column in :func:`compute_stop_stats_base`
@@ -172,36 +158,39 @@ def compute_stop_time_series_base(stop_times, trip_subset,
     f = pd.merge(stop_times, trip_subset)
 
     if split_directions:
-        # Alter stop IDs to encode trip direction:
-        # <stop ID>-0 and <stop ID>-1
-        f['stop_id'] = f['stop_id'] + '-' +\
-          f['direction_id'].map(str)
-    stops = f['stop_id'].unique()
-
-    # Bin each stop departure time
-    bins = [i for i in range(24*60)]  # One bin for each minute
-    num_bins = len(bins)
-
-    def F(x):
-        return (hp.timestr_to_seconds(x)//60) % (24*60)
-
-    f['departure_index'] = f['departure_time'].map(F)
-
-    # Create one time series for each stop
-    series_by_stop = {stop: [0 for i in range(num_bins)]
-      for stop in stops}
-
-    for stop, group in f.groupby('stop_id'):
-        counts = Counter((bin, 0) for bin in bins) +\
-          Counter(group['departure_index'].values)
-        series_by_stop[stop] = [counts[bin] for bin in bins]
+        # Make one time series per stop ID and direction ID pair
+        by = ['stop_id', 'direction_id']
+    else:
+        by = ['stop_id']
+    s = f[by].drop_duplicates()
+    stops = pd.MultiIndex.from_arrays([s[c].values for c in by], names=by)
+    if not split_directions:
+        stops = stops.get_level_values(0)
+
+    # Bin each stop departure time, directly at the given frequency
+    # when possible, so that downsampling has nothing left to aggregate
+    width = hp.get_bin_width(freq)  # Minutes per bin
+    num_bins = 24*60//width
+    f['departure_index'] = (
+      hp.timestrs_to_seconds(f['departure_time'])//(60*width)) % num_bins
+    f = f[f['departure_index'].notnull()]
+
+    # Create one time series for each stop by counting its departures
+    # over flat (stop, bin) indices
+    cells = stops.get_indexer(
+      pd.MultiIndex.from_arrays([f[c].values for c in by])
+      if split_directions else f['stop_id'])*num_bins +\
+      f['departure_index'].values.astype(int)
+    counts = np.bincount(cells, minlength=stops.size*num_bins).reshape(
+      stops.size, num_bins)
 
     # Combine lists into dictionary of form indicator -> time series.
     # Only one indicator in this case, but could add more
     # in the future as was done with route time series.
-    rng = pd.date_range(date_label, periods=24*60, freq='Min')
+    rng = pd.date_range(date_label, periods=num_bins,
+      freq='{!s}Min'.format(width))
     series_by_indicator = {'num_trips':
-      pd.DataFrame(series_by_stop, index=rng).fillna(0)}
+      pd.DataFrame(counts.T, index=rng, columns=stops)}
 
     # Combine all time series into one time series
     g = hp.combine_time_series(series_by_indicator, kind='stop',
@@ -288,19 +277,23 @@ def build_geometry_by_stop(feed, use_utm=False, stop_ids=None):
     - ``feed.stops``
 
     """
-    d = {}
-    stops = feed.stops.copy()
+    stops = feed.stops
     if stop_ids is not None:
         stops = stops[stops['stop_id'].isin(stop_ids)]
 
+    # Use the first row of each stop, as iterating over groups would,
+    # without the overhead of grouping
+    stops = stops[stops['stop_id'].notnull()].drop_duplicates('stop_id'
+      ).sort_values('stop_id')
+    lons = stops['stop_lon'].values
+    lats = stops['stop_lat'].values
     if use_utm:
-        for stop, group in stops.groupby('stop_id'):
-            lat, lon = group[['stop_lat', 'stop_lon']].values[0]
-            d[stop] = sg.Point(utm.from_latlon(lat, lon)[:2])
+        coords = hp.latlons_to_utm(lats, lons)
     else:
-        for stop, group in stops.groupby('stop_id'):
-            lat, lon = group[['stop_lat', 'stop_lon']].values[0]
-            d[stop] = sg.Point([lon, lat])
+        coords = np.column_stack([lons, lats])
+
+    d = {stop: sg.Point(p) for stop, p in zip(stops['stop_id'].values,
+      coords)}
     return d
 
 def compute_stop_activity(feed, dates):
@@ -345,15 +338,8 @@ def compute_stop_activity(feed, dates):
         return pd.DataFrame()
 
     trip_activity = feed.compute_trip_activity(dates)
-    g = pd.merge(trip_activity, feed.stop_times).groupby('stop_id')
-    # Pandas won't allow me to simply return g[dates].max().reset_index().
-    # I get ``TypeError: unorderable types: datetime.date() < str()``.
-    # So here's a workaround.
-    for (i, date) in enumerate(dates):
-        if i == 0:
-            f = g[date].max().reset_index()
-        else:
-            f = f.merge(g[date].max().reset_index())
+    f = pd.merge(trip_activity, feed.stop_times[['trip_id', 'stop_id']])
+    f = f.groupby('stop_id')[dates].max().reset_index()
     return f
 
 def compute_stop_stats(feed, dates, split_directions=False,
@@ -420,6 +406,14 @@ def compute_stop_stats(feed, dates, split_directions=False,
 
     activity = feed.compute_trip_activity(dates)
 
+    # Slice the stop times once to the columns needed and to the trips
+    # active on some date, rather than merging all of them for each
+    # trip ID sequence below
+    ids = activity.loc[(activity[dates] > 0).any(axis=1), 'trip_id']
+    st = feed.stop_times
+    stop_times = st.loc[st['trip_id'].isin(ids),
+      ['trip_id', 'stop_id', 'departure_time']]
+
     # Collect stats for each date, memoizing stats by trip ID sequence
     # to avoid unnecessary recomputations.
     # Store in dictionary of the form
@@ -451,7 +445,7 @@ def compute_stop_stats(feed, dates, split_directions=False,
             # Compute stats
             t = feed.trips
             trips = t[t['trip_id'].isin(ids)].copy()
-            stats = compute_stop_stats_base(feed.stop_times, trips,
+            stats = compute_stop_stats_base(stop_times, trips,
               split_directions=split_directions,
               headway_start_time=headway_start_time,
               headway_end_time=headway_end_time)
@@ -544,6 +538,14 @@ def compute_stop_time_series(feed, dates, split_directions=False, freq='5Min'):
 
     activity = feed.compute_trip_activity(dates)
 
+    # Slice the stop times once to the columns needed and to the trips
+    # active on some date, rather than merging all of them for each
+    # trip ID sequence below
+    ids = activity.loc[(activity[dates] > 0).any(axis=1), 'trip_id']
+    st = feed.stop_times
+    stop_times = st.loc[st['trip_id'].isin(ids),
+      ['trip_id', 'stop_id', 'departure_time']]
+
     # Collect stats for each date, memoizing stats by trip ID sequence
     # to avoid unnecessary recomputations.
     # Store in dictionary of the form
@@ -564,8 +566,11 @@ def compute_stop_time_series(feed, dates, split_directions=False, freq='5Min'):
             # Compute stats
             t = feed.trips
             trips = t[t['trip_id'].isin(ids)].copy()
-            stats = compute_stop_time_series_base(feed.stop_times, trips,
+            stats = compute_stop_time_series_base(stop_times, trips,
               split_directions=split_directions, freq=freq, date_label=date)
+            if stats.empty:
+                # None of the trips has stats, so use null stats
+                stats = null_stats
 
             # Remember stats
             stats_and_dates_by_ids[ids] = [stats, [date]]
@@ -575,10 +580,9 @@ def compute_stop_time_series(feed, dates, split_directions=False, freq='5Min'):
     for stats, dates_ in stats_and_dates_by_ids.values():
         for date in dates_:
             f = stats.copy()
-            # Replace date
-            d = hp.datestr_to_date(date)
-            f.index = f.index.map(lambda t: t.replace(
-              year=d.year, month=d.month, day=d.day))
+            # Replace date, keeping the times of day
+            f.index = pd.to_datetime(date) + (
+              f.index - f.index.normalize())
             frames.append(f)
 
     f = pd.concat(frames).sort_index().sort_index(axis=1, sort_remaining=True)
@@ -1,12 +1,18 @@
 """
 Functions about trips.
 """
-from collections import OrderedDict
 import json
 
 import pandas as pd
 import numpy as np
 import shapely.geometry as sg
+try:
+    # Vectorized geometry functions of Shapely 2
+    from shapely import (line_interpolate_point, line_locate_point,
+      get_coordinates)
+except ImportError:
+    line_interpolate_point = None
+    line_locate_point = None
 
 from . import helpers as hp
 
@@ -47,27 +53,24 @@ def is_active_trip(feed, trip_id, date):
 
     """
     service = feed._trips_i.at[trip_id, 'service_id']
-    # Check feed._calendar_dates_g.
-    caldg = feed._calendar_dates_g
-    if caldg is not None:
-        if (service, date) in caldg.groups:
-            et = caldg.get_group((service, date))['exception_type'].iat[0]
+    # Check feed._calendar_dates_by_service_date
+    caldbs = feed._calendar_dates_by_service_date
+    if caldbs is not None:
+        et = caldbs.get((service, date))
+        if et is not None:
             if et == 1:
                 return True
             else:
                 # Exception type is 2
                 return False
-    # Check feed._calendar_i
-    cali = feed._calendar_i
-    if cali is not None:
-        if service in cali.index:
-            weekday_str = hp.weekday_to_str(
-              hp.datestr_to_date(date).weekday())
-            if cali.at[service, 'start_date'] <= date <= cali.at[service,
-              'end_date'] and cali.at[service, weekday_str] == 1:
-                return True
-            else:
-                return False
+    # Check feed._calendar_by_service
+    calbs = feed._calendar_by_service
+    if calbs is not None:
+        if service in calbs:
+            start_date, end_date, weekmask = calbs[service]
+            weekday = hp.datestr_to_date(date).weekday()
+            return bool(start_date <= date <= end_date and
+              (weekmask >> weekday) & 1)
     # If you made it here, then something went wrong
     return False
 
@@ -102,23 +105,14 @@ def get_trips(feed, date=None, time=None):
     del f['is_active']
 
     if time is not None:
-        # Get trips active during given time
-        g = pd.merge(f, feed.stop_times[['trip_id', 'departure_time']])
-
-        def F(group):
-            d = {}
-            start = group['departure_time'].dropna().min()
-            end = group['departure_time'].dropna().max()
-            try:
-                result = start <= time <= end
-            except TypeError:
-                result = False
-            d['is_active'] = result
-            return pd.Series(d)
-
-        h = g.groupby('trip_id').apply(F).reset_index()
-        f = pd.merge(f, h[h['is_active']])
-        del f['is_active']
+        # Get trips active during given time, that is, trips whose
+        # first and last departure times straddle the given time
+        g = feed.stop_times[['trip_id', 'departure_time']]
+        g = g[g['trip_id'].isin(f['trip_id']) &
+          g['departure_time'].notnull()].groupby('trip_id')[
+          'departure_time'].agg(['min', 'max']).reindex(f['trip_id'])
+        cond = (g['min'] <= time) & (time <= g['max'])
+        f = f[cond.values].reset_index(drop=True)
 
     return f
 
@@ -163,16 +157,50 @@ def compute_trip_activity(feed, dates):
     if not dates:
         return pd.DataFrame()
 
-    f = feed.trips.copy()
+    # Compute activity per service rather than per trip, since there
+    # are usually far fewer services than trips
+    services = pd.Series(feed.trips['service_id'].unique())
+    cal = feed.calendar
+    if cal is not None and not cal.empty:
+        cal = cal.drop_duplicates('service_id').set_index('service_id')
+        cal = cal.reindex(services.values)
+    else:
+        cal = None
+    cald = feed.calendar_dates
+    if cald is not None and not cald.empty:
+        cald = cald.drop_duplicates(['service_id', 'date'])
+    else:
+        cald = None
+
+    activity = pd.DataFrame(index=services.values)
+    for date in dates:
+        # Start with the calendar, which applies by weekday and date range
+        if cal is not None:
+            weekday_str = hp.weekday_to_str(
+              hp.datestr_to_date(date).weekday())
+            is_active = ((cal['start_date'] <= date) &
+              (cal['end_date'] >= date) & (cal[weekday_str] == 1)).values
+        else:
+            is_active = np.zeros(services.size, dtype=bool)
+
+        # Let the calendar dates override the calendar
+        if cald is not None:
+            et = services.map(cald.loc[cald['date'] == date].set_index(
+              'service_id')['exception_type']).values
+            is_active = np.where(pd.notnull(et), et == 1, is_active)
+
+        activity[date] = is_active.astype(int)
+
+    f = feed.trips[['trip_id']].copy()
     for date in dates:
-        f[date] = f['trip_id'].map(lambda trip_id:
-          int(feed.is_active_trip(trip_id, date)))
-    return f[['trip_id'] + list(dates)]
+        f[date] = feed.trips['service_id'].map(activity[date]).fillna(
+          0).astype(int)
+    return f
 
 def compute_busiest_date(feed, dates):
     """
-    Given a list of dates, return the first date that has the
-    maximum number of active trips.
+    Given a list of dates, return the date that has the maximum number
+    of active trips, breaking ties by taking the latest such date.
 
     Notes
     -----
@@ -182,8 +210,8 @@ def compute_busiest_date(feed, dates):
 
     """
     f = feed.compute_trip_activity(dates)
-    s = [(f[c].sum(), c) for c in f.columns if c != 'trip_id']
-    return max(s)[1]
+    counts = f.drop('trip_id', axis=1).sum()
+    return counts[counts == counts.max()].index.max()
 
 def compute_trip_stats(feed, compute_dist_from_shapes=False):
     """
@@ -239,64 +267,75 @@ def compute_trip_stats(feed, compute_dist_from_shapes=False):
     f = feed.trips[['route_id', 'trip_id', 'direction_id', 'shape_id']]
     f = pd.merge(f,
       feed.routes[['route_id', 'route_short_name', 'route_type']])
-    f = pd.merge(f, feed.stop_times).sort_values(['trip_id', 'stop_sequence'])
-    f['departure_time'] = f['departure_time'].map(hp.timestr_to_seconds)
+    # Merge in only the stop times columns needed below
+    cols = [c for c in ['trip_id', 'stop_id', 'stop_sequence',
+      'departure_time', 'shape_dist_traveled']
+      if c in feed.stop_times.columns]
+    f = pd.merge(f, feed.stop_times[cols]).sort_values(
+      ['trip_id', 'stop_sequence'])
+    f['departure_time'] = hp.timestrs_to_seconds(f['departure_time'])
 
     # Compute all trips stats except distance,
-    # which is possibly more involved
-    geometry_by_stop = feed.build_geometry_by_stop(use_utm=True)
+    # which is possibly more involved.
+    # Take the first and last stop times of each trip via
+    # drop_duplicates rather than applying a function to each group.
     g = f.groupby('trip_id')
-
-    def my_agg(group):
-        d = OrderedDict()
-        d['route_id'] = group['route_id'].iat[0]
-        d['route_short_name'] = group['route_short_name'].iat[0]
-        d['route_type'] = group['route_type'].iat[0]
-        d['direction_id'] = group['direction_id'].iat[0]
-        d['shape_id'] = group['shape_id'].iat[0]
-        d['num_stops'] = group.shape[0]
-        d['start_time'] = group['departure_time'].iat[0]
-        d['end_time'] = group['departure_time'].iat[-1]
-        d['start_stop_id'] = group['stop_id'].iat[0]
-        d['end_stop_id'] = group['stop_id'].iat[-1]
-        dist = geometry_by_stop[d['start_stop_id']].distance(
-          geometry_by_stop[d['end_stop_id']])
-        d['is_loop'] = int(dist < 400)
-        d['duration'] = (d['end_time'] - d['start_time'])/3600
-        return pd.Series(d)
-
-    # Apply my_agg, but don't reset index yet.
-    # Need trip ID as index to line up the results of the
-    # forthcoming distance calculation
-    h = g.apply(my_agg)
+    first = f.drop_duplicates('trip_id', keep='first').set_index('trip_id')
+    last = f.drop_duplicates('trip_id', keep='last').set_index('trip_id')
+    h = first[['route_id', 'route_short_name', 'route_type',
+      'direction_id', 'shape_id']].copy()
+    # Make all-null shape IDs float, as the per-trip apply did
+    if h['shape_id'].isnull().all():
+        h['shape_id'] = h['shape_id'].astype(float)
+    h['num_stops'] = g.size()
+    h['start_time'] = first['departure_time']
+    h['end_time'] = last['departure_time']
+    h['start_stop_id'] = first['stop_id']
+    h['end_stop_id'] = last['stop_id']
+
+    # Compute is_loop from the distances between the start and end stops,
+    # converting the stops to UTM coordinates zone by zone
+    stops = feed.stops.drop_duplicates('stop_id').set_index('stop_id')
+    xy_by_stop = pd.DataFrame(hp.latlons_to_utm(stops['stop_lat'].values,
+      stops['stop_lon'].values), columns=['x', 'y'], index=stops.index)
+    start_xy = xy_by_stop.reindex(h['start_stop_id'].values).values
+    end_xy = xy_by_stop.reindex(h['end_stop_id'].values).values
+    dist = np.hypot(*(end_xy - start_xy).T)
+    h['is_loop'] = (dist < 400).astype(int)
+    h['duration'] = (h['end_time'] - h['start_time'])/3600
 
     # Compute distance
     if hp.is_not_null(f, 'shape_dist_traveled') and\
       not compute_dist_from_shapes:
         # Compute distances using shape_dist_traveled column
-        h['distance'] = g.apply(
-          lambda group: group['shape_dist_traveled'].max())
+        h['distance'] = g['shape_dist_traveled'].max()
     elif feed.shapes is not None:
-        # Compute distances using the shapes and Shapely
-        geometry_by_shape = feed.build_geometry_by_shape(use_utm=True)
-        geometry_by_stop = feed.build_geometry_by_stop(use_utm=True)
+        # Compute distances using the shapes and Shapely,
+        # building geometries only for the shapes and stops needed
+        geometry_by_shape = feed.build_geometry_by_shape(use_utm=True,
+          shape_ids=h['shape_id'].unique())
+        geometry_by_stop = feed.build_geometry_by_stop(use_utm=True,
+          stop_ids=np.union1d(h['start_stop_id'].dropna().values,
+          h['end_stop_id'].dropna().values))
         m_to_dist = hp.get_convert_dist('m', feed.dist_units)
 
-        def compute_dist(group):
+        def compute_dists(shape, start_stops, end_stops):
             """
-            Return the distance traveled along the trip between the first and last stops.
-            If that distance is negative or if the trip's linestring  intersects itfeed, then return the length of the trip's linestring instead.
+            Return the distances traveled along the given shape
+            between the given first and last stops of trips.
+            For each trip, if that distance is negative or if the
+            shape's linestring intersects itself, then use the length
+            of the linestring instead.
             """
-            shape = group['shape_id'].iat[0]
             try:
-                # Get the linestring for this trip
+                # Get the linestring for this shape
                 linestring = geometry_by_shape[shape]
             except KeyError:
-                # Shape ID is NaN or doesn't exist in shapes.
+                # Shape ID doesn't exist in shapes.
                 # No can do.
                 return np.nan
 
-            # If the linestring intersects itfeed, then that can cause
+            # If the linestring intersects itself, then that can cause
             # errors in the computation below, so just
             # return the length of the linestring as a good approximation
             D = linestring.length
@@ -304,37 +343,49 @@ def compute_trip_stats(feed, compute_dist_from_shapes=False):
                 return D
 
             # Otherwise, return the difference of the distances along
-            # the linestring of the first and last stop
-            start_stop = group['stop_id'].iat[0]
-            end_stop = group['stop_id'].iat[-1]
-            try:
-                start_point = geometry_by_stop[start_stop]
-                end_point = geometry_by_stop[end_stop]
-            except KeyError:
-                # One of the two stop IDs is NaN, so just
-                # return the length of the linestring
-                return D
-            d1 = linestring.project(start_point)
-            d2 = linestring.project(end_point)
-            d = d2 - d1
-            if 0 < d < D + 100:
-                return d
-            else:
-                # Something is probably wrong, so just
-                # return the length of the linestring
-                return D
-
-        h['distance'] = g.apply(compute_dist)
-        # Convert from meters
-        h['distance'] = h['distance'].map(m_to_dist)
+            # the linestring of the first and last stops,
+            # projecting all the stops onto the linestring at once.
+            # If a stop ID is NaN, then its distance is NaN, and the
+            # length of the linestring is returned below.
+            d = np.full((len(start_stops), 2), np.nan)
+            for i, stops in enumerate([start_stops, end_stops]):
+                cond = np.array([stop in geometry_by_stop for stop in stops],
+                  dtype=bool)
+                points = [geometry_by_stop[stop] for stop in stops[cond]]
+                if not points:
+                    continue
+                if line_locate_point is not None:
+                    d[cond, i] = line_locate_point(linestring, points)
+                else:
+                    d[cond, i] = [linestring.project(p) for p in points]
+            d = d[:, 1] - d[:, 0]
+            # If the distance is unreasonable, then something is
+            # probably wrong, so just use the length of the linestring
+            return np.where((0 < d) & (d < D + 100), d, D)
+
+        # Many trips share the same shape and end stops,
+        # so compute each distinct distance only once,
+        # and handle the trips of each shape together
+        cols = ['shape_id', 'start_stop_id', 'end_stop_id']
+        k = h[cols].drop_duplicates()
+        k['distance'] = np.nan
+        distances = k['distance'].values
+        start_stops = k['start_stop_id'].values
+        end_stops = k['end_stop_id'].values
+        for shape, indices in k.groupby('shape_id').indices.items():
+            distances[indices] = m_to_dist(compute_dists(shape,
+              start_stops[indices], end_stops[indices]))
+        k['distance'] = distances
+        h['distance'] = pd.merge(h[cols].reset_index(), k, how='left'
+          ).set_index('trip_id')['distance']
     else:
         h['distance'] = np.nan
 
     # Reset index and compute final stats
     h = h.reset_index()
     h['speed'] = h['distance']/h['duration']
-    h[['start_time', 'end_time']] = h[['start_time', 'end_time']
-      ].applymap(lambda x: hp.timestr_to_seconds(x, inverse=True))
+    for col in ['start_time', 'end_time']:
+        h[col] = hp.timestrs_to_seconds(h[col], inverse=True)
 
     return h.sort_values(['route_id', 'direction_id', 'start_time'])
 
@@ -385,35 +436,53 @@ def locate_trips(feed, date, times):
 
     # Start with stop times active on date
     f = feed.get_stop_times(date)
-    f['departure_time'] = f['departure_time'].map(
-      hp.timestr_to_seconds)
+    f['departure_time'] = hp.timestrs_to_seconds(f['departure_time'])
 
     # Compute relative distance of each trip along its path
     # at the given time times.
     # Use linear interpolation based on stop departure times and
     # shape distance traveled.
     geometry_by_shape = feed.build_geometry_by_shape(use_utm=False)
-    sample_times = np.array([hp.timestr_to_seconds(s)
-      for s in times])
-
-    def compute_rel_dist(group):
-        dists = sorted(group['shape_dist_traveled'].values)
-        times = sorted(group['departure_time'].values)
-        ts = sample_times[(sample_times >= times[0]) &
-          (sample_times <= times[-1])]
-        ds = np.interp(ts, times, dists)
-        return pd.DataFrame({'time': ts, 'rel_dist': ds/dists[-1]})
-
-    # return f.groupby('trip_id', group_keys=False).\
-    #   apply(compute_rel_dist).reset_index()
-    g = f.groupby('trip_id').apply(compute_rel_dist).reset_index()
-
-    # Delete extraneous multi-index column
-    del g['level_1']
+    sample_times = hp.timestrs_to_seconds(times).values
+
+    # Interpolate all trips at once, as np.interp would trip by trip,
+    # after sorting the departure times and distances of each trip.
+    # Ignore stop times without departure times or distances.
+    f = f[f['departure_time'].notnull() &
+      f['shape_dist_traveled'].notnull()]
+    codes, trip_ids = pd.factorize(f['trip_id'], sort=True)
+    deps = f['departure_time'].values.astype(float)
+    dists = f['shape_dist_traveled'].values.astype(float)
+    deps = deps[np.lexsort([deps, codes])]
+    dists = dists[np.lexsort([dists, codes])]
+    codes = np.sort(codes)
+    starts = np.searchsorted(codes, np.arange(trip_ids.size))
+    ends = np.searchsorted(codes, np.arange(trip_ids.size), side='right')
+
+    # Pair each trip with the sample times within its time range
+    trip_index = np.repeat(np.arange(trip_ids.size), sample_times.size)
+    ts = np.tile(sample_times, trip_ids.size).astype(float)
+    lo = starts[trip_index]
+    hi = ends[trip_index]
+    cond = (ts >= deps[lo]) & (ts <= deps[hi - 1])
+    trip_index, ts, lo, hi = trip_index[cond], ts[cond], lo[cond], hi[cond]
+
+    # Find the last departure time of each trip at or before each sample
+    # time by searching the departure times offset by trip
+    span = np.ptp(deps) + 1 if deps.size else 1
+    j = np.searchsorted(codes*span + deps, trip_index*span + ts,
+      side='right') - 1
+    ds = dists[j]
+    k = (j < hi - 1) & (deps[j] != ts)
+    jk = j[k]
+    slope = (dists[jk + 1] - dists[jk])/(deps[jk + 1] - deps[jk])
+    ds[k] = slope*(ts[k] - deps[jk]) + dists[jk]
+
+    g = pd.DataFrame({'trip_id': trip_ids.values[trip_index], 'time': ts,
+      'rel_dist': ds/dists[hi - 1]})
 
     # Convert times back to time strings
-    g['time'] = g['time'].map(
-      lambda x: hp.timestr_to_seconds(x, inverse=True))
+    g['time'] = hp.timestrs_to_seconds(g['time'], inverse=True)
 
     # Merge in more trip info and
     # compute longitude and latitude of trip from relative distance
@@ -426,15 +495,22 @@ def locate_trips(feed, date, times):
         h['lat'] = pd.Series()
         return h
 
-    def get_lonlat(group):
-        shape = group['shape_id'].iat[0]
+    # Interpolate all the points on a shape in one batch
+    lonlats = np.full((h.shape[0], 2), np.nan)
+    rel_dists = h['rel_dist'].values
+    for shape, indices in h.groupby('shape_id').indices.items():
         linestring = geometry_by_shape[shape]
-        lonlats = [linestring.interpolate(d, normalized=True).coords[0]
-          for d in group['rel_dist'].values]
-        group['lon'], group['lat'] = zip(*lonlats)
-        return group
-
-    return h.groupby('shape_id').apply(get_lonlat)
+        if line_interpolate_point is not None:
+            points = line_interpolate_point(linestring, rel_dists[indices],
+              normalized=True)
+            lonlats[indices] = get_coordinates(points)
+        else:
+            lonlats[indices] = [
+              linestring.interpolate(d, normalized=True).coords[0]
+              for d in rel_dists[indices]]
+    h['lon'], h['lat'] = lonlats.T
+
+    return h
 
 def trip_to_geojson(feed, trip_id, include_stops=False):
     """
@@ -16,6 +16,8 @@ from . import helpers as hp
 TIME_PATTERN1 = re.compile(r'^[0,1,2,3]\d:\d\d:\d\d$')
 TIME_PATTERN2 = re.compile(r'^\d:\d\d:\d\d$')
 DATE_FORMAT = '%Y%m%d'
+# YYYYMMDD with a four-digit year, as DATE_FORMAT formats
+DATE_PATTERN = re.compile(r'^[1-9]\d{7}\Z', re.ASCII)
 TIMEZONES = set(pytz.all_timezones)
 # ISO639-1 language codes, both lower and upper case
 LANGS = set([lang.alpha_2 for lang in pycountry.languages
@@ -49,7 +51,7 @@ def valid_time(x):
     otherwise return ``False``.
     """
     if isinstance(x, str) and\
-      (re.match(TIME_PATTERN1, x) or re.match(TIME_PATTERN2, x)):
+      (TIME_PATTERN1.match(x) or TIME_PATTERN2.match(x)):
         return True
     else:
         return False
@@ -59,12 +61,13 @@ def valid_date(x):
     Retrun ``True`` if ``x`` is a valid YYYYMMDD date;
     otherwise return ``False``.
     """
-    try:
-        if x != dt.datetime.strptime(x, DATE_FORMAT).strftime(DATE_FORMAT):
-            raise ValueError
-        return True
-    except ValueError:
-        return False
+    if isinstance(x, str) and DATE_PATTERN.match(x):
+        try:
+            dt.date(int(x[:4]), int(x[4:6]), int(x[6:]))
+            return True
+        except ValueError:
+            pass
+    return False
 
 def valid_timezone(x):
     """
@@ -91,7 +94,7 @@ def valid_url(x):
     """
     Return ``True`` if ``x`` is a valid URL; otherwise return ``False``.
     """
-    if isinstance(x, str) and re.match(URL_PATTERN, x):
+    if isinstance(x, str) and URL_PATTERN.match(x):
         return True
     else:
         return False
@@ -101,7 +104,7 @@ def valid_email(x):
     Return ``True`` if ``x`` is a valid email address; otherwise return
     ``False``.
     """
-    if isinstance(x, str) and re.match(EMAIL_PATTERN, x):
+    if isinstance(x, str) and EMAIL_PATTERN.match(x):
         return True
     else:
         return False
@@ -111,7 +114,7 @@ def valid_color(x):
     Return ``True`` if ``x`` a valid hexadecimal color string without
     the leading hash; otherwise return ``False``.
     """
-    if isinstance(x, str) and re.match(COLOR_PATTERN, x):
+    if isinstance(x, str) and COLOR_PATTERN.match(x):
         return True
     else:
         return False
@@ -297,14 +300,27 @@ def check_column(problems, table, df, column, column_required, checker,
         If not ``column_required``, then NaN entries will be ignored
         before applying the checker.
 
+    Notes
+    -----
+    Apply the checker only once to each distinct non-NaN entry,
+    since GTFS columns such as times, colors, and URLs are highly
+    repetitive.
+
     """
-    f = df.copy()
+    f = df
     if not column_required:
         if column not in f.columns:
-            f[column] = np.nan
+            return problems
         f = f.dropna(subset=[column])
 
-    cond = ~f[column].map(checker)
+    s = f[column]
+    codes, uniques = pd.factorize(s)
+    is_valid = np.empty(s.shape[0], dtype=bool)
+    if uniques.size:
+        is_valid_unique = np.array([bool(checker(x)) for x in uniques])
+        is_valid[codes != -1] = is_valid_unique[codes[codes != -1]]
+    is_valid[codes == -1] = [bool(checker(x)) for x in s.values[codes == -1]]
+    cond = pd.Series(~is_valid, index=f.index)
     problems = check_table(problems, table, f, cond,
       'Invalid {!s}; maybe has extra space characters'.format(column), type_)
 
@@ -549,11 +565,13 @@ def check_calendar(feed, as_df=False, include_warnings=False):
     # Check service_id
     problems = check_column_id(problems, table, f, 'service_id')
 
-    # Check weekday columns
-    v = lambda x: x in range(2)
-    for col in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday',
-      'saturday', 'sunday']:
-        problems = check_column(problems, table, f, col, True, v)
+    # Check weekday columns, flagging all of them in one pass
+    weekdays = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday',
+      'saturday', 'sunday']
+    invalid = ~f[weekdays].isin([0, 1])
+    for col in weekdays:
+        problems = check_table(problems, table, f, invalid[col],
+          'Invalid {!s}; maybe has extra space characters'.format(col))
 
     # Check start_date and end_date
     for col in ['start_date', 'end_date']:
@@ -756,7 +774,7 @@ def check_frequencies(feed, as_df=False, include_warnings=False):
         problems = check_column(problems, table, f, col, True, valid_time)
 
     for col in time_cols:
-        f[col] = f[col].map(hp.timestr_to_seconds)
+        f[col] = hp.timestrs_to_seconds(f[col])
 
     # start_time should be earlier than end_time
     cond = f['start_time'] >= f['end_time']
@@ -23,7 +23,7 @@ setup(
     install_requires=[
         'Shapely>=1.5.1',
         'pandas>=0.18.1',
-        'utm>=0.3.1',
+        'utm>=0.5.0',
         'pycountry==17.1.8',
     ],
     packages=find_packages(exclude=('tests', 'docs'))
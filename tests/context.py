@@ -2,6 +2,7 @@ import os
 import sys
 from pathlib import Path
 import importlib
+import functools
 sys.path.insert(0, os.path.abspath('..'))
 
 import pandas as pd
@@ -35,3 +36,14 @@ cairns_shapeless.trips = t
 week = cairns.get_first_week()
 cairns_dates = [week[0], week[1]]
 cairns_trip_stats = pd.read_csv(DATA_DIR/'cairns_trip_stats.csv', dtype=gtfstk.DTYPE)
+
+
+@functools.lru_cache()
+def get_cairns_route_stats(dates, split_directions):
+    """
+    Return the route stats of ``cairns`` for the given tuple of dates,
+    computed once and shared by the tests that need them.
+    Don't mutate the result.
+    """
+    return gtfstk.compute_route_stats(cairns, cairns_trip_stats,
+      list(dates), split_directions=split_directions)
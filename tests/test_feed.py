@@ -1,8 +1,11 @@
 import pytest
+import shutil
+import tempfile
+import zipfile
 from pathlib import Path
 
 import pandas as pd
-from pandas.util.testing import assert_frame_equal
+from pandas.util.testing import assert_frame_equal, assert_series_equal
 import numpy as np
 
 from .context import gtfstk, slow, DATA_DIR
@@ -74,6 +77,36 @@ def test_list_gtfs():
         assert set(f.columns) == {'file_name', 'file_size'}
         assert f.shape[0] == 11
 
+def test_read_gtfs_table(monkeypatch):
+    pytest.importorskip('pyarrow')
+    tmp_dir = tempfile.TemporaryDirectory()
+    path = Path(tmp_dir.name)/'stop_times.txt'
+    path.write_text(
+      'trip_id,stop_id,stop_sequence,arrival_time,bingo_time,bingo_date,'
+      'bingo_stamp,bingo_num,bingo_null\n'
+      't1,s1,1,08:00:00,08:00:00,2017-01-01,2017-01-01 08:00:00,1,\n'
+      't1,s2,2,,25:00:00,2017-01-02,2017-01-02 08:00:00,,\n')
+    empty_path = Path(tmp_dir.name)/'shapes.txt'
+    empty_path.write_text('shape_id,shape_pt_lat,shape_pt_lon,'
+      'shape_pt_sequence,shape_dist_traveled\n')
+
+    # The PyArrow and Pandas parsers should agree, dtypes included,
+    # also on non-GTFS columns that look like dates or times,
+    # on all-null columns, and on header-only files
+    f = read_gtfs_table(path)
+    with path.open('rb') as src:
+        g = read_gtfs_table(src)
+    f_empty = read_gtfs_table(empty_path)
+    monkeypatch.setattr(gtfstk.feed, 'pa', None)
+    h = read_gtfs_table(path)
+    h_empty = read_gtfs_table(empty_path)
+    for x, y in [(f, h), (g, h), (f_empty, h_empty)]:
+        assert_frame_equal(x, y)
+        assert_series_equal(x.dtypes, y.dtypes)
+    assert (h[['bingo_time', 'bingo_date', 'bingo_stamp']].dtypes ==
+      object).all()
+    tmp_dir.cleanup()
+
 def test_read_gtfs():
     # Bad path
     with pytest.raises(ValueError):
@@ -126,3 +159,15 @@ def test_write_gtfs():
     assert t[~t['direction_id'].isin([np.nan, '0', '1'])].empty
     tmp_dir.cleanup()
     q.unlink()
+
+    # A table that fails to write should raise an error and still leave
+    # a readable archive
+    f = feed3.stop_times.copy()
+    f['stop_sequence'] = f['stop_sequence'].astype(object)
+    f.loc[0, 'stop_sequence'] = 'bingo'
+    feed3.stop_times = f
+    with pytest.raises(ValueError):
+        write_gtfs(feed3, q)
+    with zipfile.ZipFile(str(q)) as zf:
+        assert zf.testzip() is None
+    q.unlink()
@@ -3,7 +3,9 @@ import pytest
 import pandas as pd
 import numpy as np
 from numpy.testing import assert_array_equal
+from pandas.util.testing import assert_series_equal
 import shapely.geometry as sg
+import utm
 
 from .context import gtfstk, slow
 from gtfstk import *
@@ -23,6 +25,29 @@ def test_time_to_seconds():
     assert np.isnan(timestr_to_seconds(seconds1))
     assert np.isnan(timestr_to_seconds(timestr1, inverse=True))
 
+def test_timestrs_to_seconds():
+    timestrs = pd.Series(['01:01:01', '25:01:01', '1:01:01', '101:01:01',
+      ' 01:01:01', '01:01', 'bingo', np.nan, 3661], index=list('abcdefghi'))
+    for mod24 in [False, True]:
+        expect = timestrs.map(lambda x: timestr_to_seconds(x, mod24=mod24))
+        get = timestrs_to_seconds(timestrs, mod24=mod24)
+        assert_series_equal(get, expect)
+
+        seconds = pd.Series([3661, 25*3600 + 61, 101*3600 + 61, np.nan, -1])
+        expect = seconds.map(lambda x: timestr_to_seconds(x, inverse=True,
+          mod24=mod24))
+        get = timestrs_to_seconds(seconds, inverse=True, mod24=mod24)
+        assert_series_equal(get, expect)
+
+    # Integer output when there are no missing values
+    get = timestrs_to_seconds(pd.Series(['01:01:01', '1:01:01']))
+    assert_series_equal(get, pd.Series([3661, 3661]))
+
+    # Only short time strings
+    get = timestrs_to_seconds(pd.Series(['7:00:00', '1:01:01', '']))
+    expect = pd.Series([7*3600, 3661, np.nan])
+    assert_series_equal(get, expect)
+
 def test_time_mod24():
     timestr1 = '01:01:01'
     assert timestr_mod24(timestr1) == timestr1
@@ -34,6 +59,9 @@ def test_datestr_to_date():
     date = dt.date(2014, 1, 2)
     assert datestr_to_date(datestr) == date
     assert datestr_to_date(date, inverse=True) == datestr
+    assert datestr_to_date('2014-01-02', format_str='%Y-%m-%d') == date
+    with pytest.raises(ValueError):
+        datestr_to_date('20141302')
 
 def test_get_convert_dist():
     di = 'mi'
@@ -63,6 +91,36 @@ def test_get_peak_indices():
     expect = [0, 1]
     assert_array_equal(get, expect)
 
+def test_get_max_workers():
+    assert get_max_workers(0) == 1
+    assert get_max_workers(1) == 1
+    assert 1 <= get_max_workers(1000) <= 1000
+
+def test_count_active_trips():
+    f = pd.DataFrame([[0, 10], [5, 15], [np.nan, 20]],
+      columns=['start_time', 'end_time'])
+    assert count_active_trips(f, 5) == 2
+    assert count_active_trips(f, 10) == 1
+    assert count_active_trips(f, 15) == 0
+
+def test_get_active_trip_counts():
+    starts = [0, 5, 5, np.nan, 8]
+    ends = [10, 15, 6, 20, 8]
+    times = [0, 5, 6, 10, 14, 15]
+    get = get_active_trip_counts(starts, ends, times)
+    expect = [1, 3, 2, 1, 1, 0]
+    assert_array_equal(get, expect)
+
+def test_get_bin_width():
+    assert get_bin_width('5Min') == 5
+    assert get_bin_width('1H') == 60
+    assert get_bin_width('1Min') == 1
+    # Frequencies that don't evenly divide a day into whole minutes
+    assert get_bin_width('7Min') == 1
+    assert get_bin_width('30S') == 1
+    assert get_bin_width('90S') == 1
+    assert get_bin_width('M') == 1
+
 def test_almost_equal():
     f = pd.DataFrame([[1, 2], [3, 4]], columns=['a', 'b'])
     assert almost_equal(f, f)
@@ -72,6 +130,8 @@ def test_almost_equal():
     assert not almost_equal(f, h)
     h = pd.DataFrame()
     assert not almost_equal(f, h)
+    h = f.astype(float)
+    assert not almost_equal(f, h)
 
 def test_is_not_null():
     f = None
@@ -86,3 +146,46 @@ def test_is_not_null():
 
     f = pd.DataFrame([[1, np.nan], [2, 2]], columns=['bar', c])
     assert is_not_null(f, c)
+
+def test_get_headway_stats():
+    f = pd.DataFrame([
+      ['r1', 0, 3600],
+      ['r1', 0, 0],
+      ['r1', 0, 1200],
+      ['r1', 1, 1800],
+      ['r1', 1, 5400],
+      ['r2', 0, 600],
+      ['r2', 0, np.nan],
+      ], columns=['route_id', 'direction_id', 'time'])
+    get = get_headway_stats(f, ['route_id', 'direction_id'], 'time',
+      0, 3600)
+    assert get.columns.tolist() == ['max_headway', 'min_headway',
+      'mean_headway']
+    # Groups with fewer than two times in range should be omitted
+    assert get.index.tolist() == [('r1', 0)]
+    assert get.loc[('r1', 0)].tolist() == [40, 20, 30]
+
+    get = get_headway_stats(f, ['route_id', 'direction_id'], 'time',
+      0, 7200, agg_by=['route_id'])
+    assert get.index.tolist() == ['r1']
+    assert get.loc['r1'].tolist() == [60, 20, 40]
+
+def test_get_active_trip_count_changes():
+    start_times = [0, 5, 5, np.nan, 8, 10]
+    end_times = [10, 15, 6, 20, 8, 12]
+    times, counts = get_active_trip_count_changes(start_times, end_times)
+    assert_array_equal(times, [0, 5, 6, 10, 12, 15])
+    assert_array_equal(counts, [1, 3, 2, 2, 1, 0])
+    # Counts should agree with those at the same times
+    assert_array_equal(counts, get_active_trip_counts(start_times,
+      end_times, times))
+
+def test_latlons_to_utm():
+    # Points in different UTM zones and hemispheres and in Norway
+    lats = [-16.9, -16.8, 47.9, 47.8, 60.0, 0]
+    lons = [145.7, 145.8, 7.8, -122.6, 5.3, 179.9]
+    get = latlons_to_utm(lats, lons)
+    expect = np.array([utm.from_latlon(lat, lon)[:2]
+      for lat, lon in zip(lats, lons)])
+    assert_array_equal(get, expect)
+    assert latlons_to_utm([], []).shape == (0, 2)
@@ -110,6 +110,9 @@ def test_compute_feed_time_series():
       'service_speed',
       }
     assert set(f.columns) == expect_cols
+    # Counts should be integers
+    for col in ['num_trip_starts', 'num_trip_ends', 'num_trips']:
+        assert f[col].dtype == np.int64
 
     # Empty check
     f = compute_feed_time_series(feed, trip_stats, [])
@@ -1,4 +1,5 @@
 import pandas as pd
+from pandas.util.testing import assert_index_equal
 import numpy as np
 
 from .context import gtfstk, slow, HAS_GEOPANDAS, DATA_DIR, sample, cairns, cairns_dates, cairns_trip_stats
@@ -14,7 +15,8 @@ def test_get_stop_times():
     # Should have a reasonable shape
     assert f.shape[0] <= feed.stop_times.shape[0]
     # Should have correct columns
-    assert set(f.columns) == set(feed.stop_times.columns)
+    assert_index_equal(f.columns.sort_values(),
+      feed.stop_times.columns.sort_values())
 
 def test_get_start_and_end_times():
     feed = cairns.copy()
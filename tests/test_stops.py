@@ -1,7 +1,7 @@
 import pytest
 
 import pandas as pd
-from pandas.util.testing import assert_frame_equal
+from pandas.util.testing import assert_frame_equal, assert_index_equal
 import shapely.geometry as sg
 
 from .context import gtfstk, slow, HAS_GEOPANDAS, DATA_DIR, sample, cairns, cairns_dates, cairns_trip_stats
@@ -99,7 +99,8 @@ def test_get_stops():
         assert f.shape[0] <= feed.stops.shape[0]
         assert f.shape[1] == feed.stops.shape[1]
         # Should have correct columns
-        set(f.columns) == set(feed.stops.columns)
+        assert_index_equal(f.columns.sort_values(),
+          feed.stops.columns.sort_values())
     # Number of rows should be reasonable
     assert frames[0].shape[0] <= frames[1].shape[0]
     assert frames[2].shape[0] <= frames[4].shape[0]
@@ -252,6 +253,21 @@ def test_compute_stop_time_series():
         assert ts.columns.names == expect_names
         assert pd.isnull(ts.values).all()
 
+        # Dates whose active trips all lack stop times should yield
+        # null stats
+        monday, saturday = feed.get_first_week()[0:6:5]
+        activity = feed.compute_trip_activity([saturday])
+        feed1 = feed.copy()
+        st = feed1.stop_times
+        feed1.stop_times = st[st['trip_id'].isin(
+          activity.loc[activity[saturday] == 0, 'trip_id'])].copy()
+        ts = compute_stop_time_series(feed1, [monday, saturday], freq='1H',
+          split_directions=split_directions)
+        assert ts.shape[0] == 6*24
+        assert ts.columns.names == expect_names
+        assert pd.notnull(ts.loc[monday].values).any()
+        assert pd.isnull(ts.loc[saturday].values).all()
+
 def test_build_stop_timetable():
     feed = cairns.copy()
     stop_id = feed.stops['stop_id'].values[0]
@@ -1,7 +1,9 @@
 import pandas as pd
+from pandas.util.testing import assert_index_equal
 import numpy as np
+import utm
 
-from .context import gtfstk, slow, DATA_DIR, cairns, cairns_shapeless, cairns_dates, cairns_trip_stats
+from .context import gtfstk, slow, DATA_DIR, sample, cairns, cairns_shapeless, cairns_dates, cairns_trip_stats
 from gtfstk import *
 
 
@@ -19,6 +21,14 @@ def test_is_active_trip():
     assert is_active_trip(feed, trip_id, date1)
     assert not is_active_trip(feed, trip_id, date2)
 
+    # Check calendar date exceptions
+    service = feed.trips.loc[feed.trips['trip_id'] == trip_id,
+      'service_id'].iat[0]
+    feed.calendar_dates = pd.DataFrame([[service, date1, 2],
+      [service, date2, 1]], columns=['service_id', 'date', 'exception_type'])
+    assert not is_active_trip(feed, trip_id, date1)
+    assert is_active_trip(feed, trip_id, date2)
+
 def test_get_trips():
     feed = cairns.copy()
     date = cairns_dates[0]
@@ -29,7 +39,8 @@ def test_get_trips():
     assert trips1.shape[0] <= feed.trips.shape[0]
     assert trips1.shape[1] == feed.trips.shape[1]
     # Should have correct columns
-    assert set(trips1.columns) == set(feed.trips.columns)
+    assert_index_equal(trips1.columns.sort_values(),
+      feed.trips.columns.sort_values())
 
     trips2 = get_trips(feed, date, "07:30:00")
     # Should be a data frame
@@ -38,7 +49,8 @@ def test_get_trips():
     assert trips2.shape[0] <= trips2.shape[0]
     assert trips2.shape[1] == trips1.shape[1]
     # Should have correct columns
-    assert set(trips2.columns) == set(feed.trips.columns)
+    assert_index_equal(trips2.columns.sort_values(),
+      feed.trips.columns.sort_values())
 
 def test_compute_trip_activity():
     feed = cairns.copy()
@@ -51,6 +63,11 @@ def test_compute_trip_activity():
     assert trips_activity.shape[1] == 1 + len(dates)
     # Date columns should contain only zeros and ones
     assert set(trips_activity[dates].values.flatten()) == {0, 1}
+    # Should agree with is_active_trip
+    for date in dates[:2]:
+        expect = feed.trips['trip_id'].map(
+          lambda trip_id: int(is_active_trip(feed, trip_id, date)))
+        assert (trips_activity[date] == expect).all()
 
 def test_compute_busiest_date():
     feed = cairns.copy()
@@ -59,6 +76,13 @@ def test_compute_busiest_date():
     # Busiest day should lie in first week
     assert date in dates
 
+    # Ties should go to the latest date
+    dates = get_first_week(feed)[:4]
+    activity = compute_trip_activity(feed, dates)
+    assert activity[dates].sum().nunique() == 1
+    assert compute_busiest_date(feed, dates[::-1]) == dates[-1]
+    assert compute_busiest_date(feed, dates) == dates[-1]
+
 @slow
 def test_compute_trip_stats():
     feed = cairns.copy()
@@ -94,11 +118,33 @@ def test_compute_trip_stats():
     assert len(trip_stats['distance'].unique()) == 1
     assert np.isnan(trip_stats['distance'].unique()[0])
 
+    # Feeds with only null shape IDs should have float shape IDs
+    trip_stats2 = compute_trip_stats(sample)
+    assert trip_stats2['shape_id'].isnull().all()
+    assert trip_stats2['shape_id'].dtype == float
+
     # Should contain the correct trips
     get_trips = set(trip_stats['trip_id'].values)
     expect_trips = set(feed.trips['trip_id'].values)
     assert get_trips == expect_trips
 
+def test_compute_trip_stats_across_equator():
+    # Move the sample stops so that they straddle the equator
+    feed = sample.copy()
+    stops = feed.stops.copy()
+    stops['stop_lat'] -= stops['stop_lat'].median()
+    feed.stops = stops
+    assert (stops['stop_lat'] < 0).any() and (stops['stop_lat'] > 0).any()
+    trip_stats = compute_trip_stats(feed)
+
+    # Loops should agree with those computed from stops converted to
+    # UTM one by one
+    xy_by_stop = {stop_id: utm.from_latlon(lat, lon)[:2]
+      for stop_id, lat, lon in stops[['stop_id', 'stop_lat', 'stop_lon']].values}
+    expect = [int(np.hypot(*np.subtract(xy_by_stop[a], xy_by_stop[b])) < 400)
+      for a, b in trip_stats[['start_stop_id', 'end_stop_id']].values]
+    assert trip_stats['is_loop'].tolist() == expect
+
 @slow
 def test_locate_trips():
     feed = cairns.copy()
@@ -1,9 +1,295 @@
+import copy
+
+import pytest
 import pandas as pd
+import numpy as np
 
 from .context import gtfstk, slow, sample
 from gtfstk import *
 
 
+# The feed mutators below replace the tables they change rather than
+# changing them in place, so that they can act on shallow copies of
+# the sample feed, which share the other tables with it.
+# They are named after the changes they make, which names the test
+# cases that use them.
+
+def setting(table, column, value, row=None):
+    """
+    Return a function that sets the given column of the given table of
+    a feed to the given value, or only its entry in the given row
+    position if ``row`` is given.
+    If the value is a function, then apply it to the table to get the
+    value to set.
+    """
+    def mutate(feed):
+        f = getattr(feed, table).copy()
+        v = value(f) if callable(value) else value
+        if row is None:
+            f[column] = v
+        else:
+            f[column].iat[row] = v
+        setattr(feed, table, f)
+    target = '{!s}.{!s}'.format(table, column)
+    if row is not None:
+        target += '[{!s}]'.format(row)
+    mutate.__name__ = '{!s}={!s}'.format(target,
+      '<computed>' if callable(value) else repr(value))
+    return mutate
+
+def dropping(table, column=None):
+    """
+    Return a function that deletes the given column of the given table
+    of a feed, or the whole table if no column is given.
+    """
+    def mutate(feed):
+        if column is None:
+            setattr(feed, table, None)
+        else:
+            setattr(feed, table, getattr(feed, table).drop(column, axis=1))
+    mutate.__name__ = 'drop_' + (table if column is None
+      else '{!s}.{!s}'.format(table, column))
+    return mutate
+
+def combining(*mutators):
+    """
+    Return a function that applies the given feed mutators in order.
+    """
+    def mutate(feed):
+        for m in mutators:
+            m(feed)
+    mutate.__name__ = '+'.join(m.__name__ for m in mutators)
+    return mutate
+
+def duplicating(table):
+    """
+    Return a function that appends a copy of the first row of the given
+    table of a feed to that table.
+    """
+    def mutate(feed):
+        f = getattr(feed, table)
+        setattr(feed, table, pd.concat([f, f.iloc[:1]]))
+    mutate.__name__ = 'duplicate_{!s}[0]'.format(table)
+    return mutate
+
+def add_feed_info(feed):
+    """
+    Give the feed a small valid feed info table.
+    """
+    rows = [['slurp', 'http://slurp.burp', 'aa', '21110101', '21110102', '69']]
+    columns = ['feed_publisher_name', 'feed_publisher_url', 'feed_lang',
+      'feed_start_date', 'feed_end_date', 'feed_version']
+    feed.feed_info = pd.DataFrame(rows, columns=columns)
+
+def add_transfers(feed):
+    """
+    Give the feed a small valid transfers table.
+    """
+    rows = [[feed.stops['stop_id'].iat[0], feed.stops['stop_id'].iat[1], 2,
+      3600]]
+    columns = ['from_stop_id', 'to_stop_id', 'transfer_type',
+      'min_transfer_time']
+    feed.transfers = pd.DataFrame(rows, columns=columns)
+
+def add_shapes(feed):
+    """
+    Give the feed a small valid shapes table.
+    """
+    rows = [
+      ['1100015',-16.743632,145.668255,10001, 1.2],
+      ['1100015',-16.743522,145.668394,10002, 1.3],
+      ]
+    columns=['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence', 'shape_dist_traveled']
+    feed.shapes = pd.DataFrame(rows, columns=columns)
+
+def drop_first_trip_stop_times(feed):
+    """
+    Delete the stop times of the first trip of the feed.
+    """
+    tid = feed.trips['trip_id'].iat[0]
+    feed.stop_times = feed.stop_times[feed.stop_times['trip_id'] != tid].copy()
+
+#: Triples of the form (check function, feed mutator, is warning),
+#: where the mutator introduces a problem into a copy of the sample
+#: feed that the check function should find, namely a warning if
+#: the third item is ``True`` and an error otherwise
+PROBLEMS = [
+  (check_agency, dropping('agency'), False),
+  (check_agency, dropping('agency', 'agency_name'), False),
+  (check_agency, setting('agency', 'b', 3), True),
+  (check_agency, duplicating('agency'), False),
+  ] + [
+  (check_agency, setting('agency', column, ''), False)
+  for column in ['agency_name', 'agency_timezone', 'agency_url',
+    'agency_fare_url', 'agency_lang', 'agency_phone', 'agency_email']
+  ] + [
+  (check_calendar, dropping('calendar', 'service_id'), False),
+  (check_calendar, setting('calendar', 'yo', 3), True),
+  (check_calendar, setting('calendar', 'service_id',
+    lambda f: f['service_id'].iat[1], 0), False),
+  ] + [
+  (check_calendar, setting('calendar', column, '5', 0), False)
+  for column in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday',
+    'saturday', 'sunday', 'start_date', 'end_date']
+  ] + [
+  (check_calendar_dates, dropping('calendar_dates', 'service_id'), False),
+  (check_calendar_dates, setting('calendar_dates', 'yo', 3), True),
+  (check_calendar_dates, duplicating('calendar_dates'), False),
+  ] + [
+  (check_calendar_dates, setting('calendar_dates', column, '5', 0), False)
+  for column in ['date', 'exception_type']
+  ] + [
+  (check_fare_attributes, dropping('fare_attributes', 'fare_id'), False),
+  (check_fare_attributes, setting('fare_attributes', 'yo', 3), True),
+  (check_fare_attributes, duplicating('fare_attributes'), False),
+  (check_fare_attributes, setting('fare_attributes', 'currency_type',
+    'jubjub'), False),
+  ] + [
+  (check_fare_attributes, setting('fare_attributes', column, -7), False)
+  for column in ['payment_method', 'transfers', 'transfer_duration']
+  ] + [
+  (check_fare_rules, dropping('fare_rules', 'fare_id'), False),
+  (check_fare_rules, setting('fare_rules', 'yo', 3), True),
+  ] + [
+  (check_fare_rules, setting('fare_rules', column, 'tuberosity'), False)
+  for column in ['fare_id', 'route_id', 'origin_id', 'destination_id',
+    'contains_id']
+  ] + [
+  (check_feed_info, combining(add_feed_info,
+    dropping('feed_info', 'feed_lang')), False),
+  (check_feed_info, combining(add_feed_info, setting('feed_info', 'yo', 3)),
+    True),
+  ] + [
+  (check_feed_info, combining(add_feed_info,
+    setting('feed_info', column, '')), False)
+  for column in ['feed_publisher_name', 'feed_publisher_url', 'feed_lang',
+    'feed_start_date', 'feed_end_date', 'feed_version']
+  ] + [
+  (check_frequencies, dropping('frequencies', 'trip_id'), False),
+  (check_frequencies, setting('frequencies', 'yo', 3), True),
+  (check_frequencies, setting('frequencies', 'trip_id', 'ratatat', 0),
+    False),
+  (check_frequencies, duplicating('frequencies'), False),
+  ] + [
+  (check_frequencies, setting('frequencies', column, 'oingo'), False)
+  for column in ['start_time', 'end_time']
+  ] + [
+  (check_frequencies, setting('frequencies', column, -7), False)
+  for column in ['headway_secs', 'exact_times']
+  ] + [
+  (check_routes, dropping('routes'), False),
+  (check_routes, dropping('routes', 'route_id'), False),
+  (check_routes, setting('routes', 'bingo', 3), True),
+  (check_routes, setting('routes', 'route_id',
+    lambda f: f['route_id'].iat[1], 0), False),
+  (check_routes, setting('routes', 'agency_id', 'Hubba hubba'), False),
+  (check_routes, setting('routes', 'route_short_name', '', 0), False),
+  (check_routes, combining(
+    setting('routes', 'route_short_name', '', 0),
+    setting('routes', 'route_long_name', '', 0)), False),
+  (check_routes, setting('routes', 'route_type', 8, 0), False),
+  (check_routes, setting('routes', 'route_color', 'FFF', 0), False),
+  (check_routes, setting('routes', 'route_text_color', 'FFF', 0), False),
+  (check_routes, combining(
+    setting('routes', 'route_short_name',
+      lambda f: f['route_short_name'].iat[0], 1),
+    setting('routes', 'route_long_name',
+      lambda f: f['route_long_name'].iat[0], 1)), True),
+  (check_routes, setting('routes', 'route_id', 'Shwing', 0), True),
+
+  (check_shapes, combining(add_shapes, dropping('shapes', 'shape_id')),
+    False),
+  (check_shapes, combining(add_shapes, setting('shapes', 'yo', 3)), True),
+  (check_shapes, combining(add_shapes, setting('shapes', 'shape_id', '', 0)),
+    False),
+  (check_shapes, combining(add_shapes, setting('shapes', 'shape_pt_lon',
+    185)), False),
+  (check_shapes, combining(add_shapes, setting('shapes', 'shape_pt_lat',
+    185)), False),
+  (check_shapes, combining(add_shapes, setting('shapes',
+    'shape_pt_sequence', lambda f: f['shape_pt_sequence'].iat[0], 1)),
+    False),
+  (check_shapes, combining(add_shapes, setting('shapes',
+    'shape_dist_traveled', 0, 1)), False),
+
+  (check_stops, dropping('stops'), False),
+  (check_stops, dropping('stops', 'stop_id'), False),
+  (check_stops, setting('stops', 'b', 3), True),
+  (check_stops, setting('stops', 'stop_id',
+    lambda f: f['stop_id'].iat[1], 0), False),
+  ] + [
+  (check_stops, setting('stops', column, ''), False)
+  for column in ['stop_code', 'stop_desc', 'zone_id', 'parent_station']
+  ] + [
+  (check_stops, setting('stops', column, 'Wa wa'), False)
+  for column in ['stop_url', 'stop_timezone']
+  ] + [
+  (check_stops, setting('stops', column, 185), False)
+  for column in ['stop_lon', 'stop_lat', 'location_type',
+    'wheelchair_boarding']
+  ] + [
+  (check_stops, combining(
+    setting('stops', 'location_type', 1),
+    setting('stops', 'parent_station', 'bingo')), False),
+  (check_stops, combining(
+    setting('stops', 'location_type', 0),
+    setting('stops', 'parent_station', lambda f: f['stop_id'].iat[1])),
+    False),
+  (check_stops, setting('stops', 'stop_id', 'Flippity flew', 0), True),
+
+  (check_stop_times, dropping('stop_times'), False),
+  (check_stop_times, dropping('stop_times', 'stop_id'), False),
+  (check_stop_times, setting('stop_times', 'b', 3), True),
+  (check_stop_times, setting('stop_times', 'trip_id', 'bingo', 0), False),
+  (check_stop_times, setting('stop_times', 'arrival_time', '1:0:00', 0),
+    False),
+  (check_stop_times, setting('stop_times', 'departure_time', '1:0:00', 0),
+    False),
+  (check_stop_times, setting('stop_times', 'arrival_time', np.nan, -1),
+    False),
+  (check_stop_times, setting('stop_times', 'stop_id', 'bingo', 0), False),
+  (check_stop_times, setting('stop_times', 'stop_headsign', '', 0), False),
+  (check_stop_times, setting('stop_times', 'stop_sequence',
+    lambda f: f['stop_sequence'].iat[0], 1), False),
+  (check_stop_times, setting('stop_times', 'pickup_type', 'bongo'), False),
+  (check_stop_times, setting('stop_times', 'drop_off_type', 'bongo'),
+    False),
+  (check_stop_times, combining(
+    setting('stop_times', 'shape_dist_traveled', 1),
+    setting('stop_times', 'shape_dist_traveled', 0.9, 1)), False),
+  (check_stop_times, setting('stop_times', 'timepoint', 3), False),
+  (check_stop_times, setting('stop_times', 'departure_time',
+    lambda f: f['departure_time'].iat[0], 1), True),
+
+  (check_transfers, combining(add_transfers,
+    dropping('transfers', 'from_stop_id')), False),
+  (check_transfers, combining(add_transfers, setting('transfers', 'yo', 3)),
+    True),
+  ] + [
+  (check_transfers, combining(add_transfers,
+    setting('transfers', column, '', 0)), False)
+  for column in ['from_stop_id', 'to_stop_id']
+  ] + [
+  (check_transfers, combining(add_transfers,
+    setting('transfers', column, -7)), False)
+  for column in ['transfer_type', 'min_transfer_time']
+  ] + [
+  (check_trips, dropping('trips'), False),
+  (check_trips, dropping('trips', 'trip_id'), False),
+  (check_trips, setting('trips', 'b', 3), True),
+  (check_trips, setting('trips', 'trip_id',
+    lambda f: f['trip_id'].iat[1], 0), False),
+  (check_trips, setting('trips', 'route_id', 'Hubba hubba'), False),
+  (check_trips, setting('trips', 'service_id', 'Boom boom'), False),
+  (check_trips, setting('trips', 'direction_id', 7, 0), False),
+  (check_trips, setting('trips', 'block_id', '', 0), False),
+  (check_trips, setting('trips', 'block_id', 'Bam', 0), False),
+  (check_trips, setting('trips', 'shape_id', 'Hello', 0), False),
+  (check_trips, setting('trips', 'wheelchair_accessible', ''), False),
+  (check_trips, drop_first_trip_stop_times, True),
+  ]
+
+
 def test_valid_str():
     assert valid_str('hello3')
     assert not valid_str(np.nan)
@@ -46,44 +332,43 @@ def test_valid_color():
 def test_check_for_required_columns():
     assert not check_for_required_columns([], 'routes', sample.routes)
 
-    feed = sample.copy()
-    del feed.routes['route_type']
-    assert check_for_required_columns([], 'routes', feed.routes)
+    routes = sample.routes.drop('route_type', axis=1)
+    assert check_for_required_columns([], 'routes', routes)
 
 def test_check_for_invalid_columns():
     assert not check_for_invalid_columns([], 'routes', sample.routes)
 
-    feed = sample.copy()
-    feed.routes['bingo'] = 'snoop'
-    assert check_for_invalid_columns([], 'routes', feed.routes)
+    routes = sample.routes.copy()
+    routes['bingo'] = 'snoop'
+    assert check_for_invalid_columns([], 'routes', routes)
 
 def test_check_table():
-    feed = sample.copy()
+    feed = sample
     cond = feed.routes['route_id'].isnull()
     assert not check_table([], 'routes', feed.routes, cond, 'Bingo')
     assert check_table([], 'routes', feed.routes, ~cond, 'Bongo')
 
 def test_check_column():
-    feed = sample.copy()
-    assert not check_column([], 'agency', feed.agency, 'agency_url', True,
+    agency = sample.agency.copy()
+    assert not check_column([], 'agency', agency, 'agency_url', True,
       valid_url)
-    feed.agency['agency_url'].iat[0] = 'example.com'
-    assert check_column([], 'agency', feed.agency, 'agency_url', True,
+    agency['agency_url'].iat[0] = 'example.com'
+    assert check_column([], 'agency', agency, 'agency_url', True,
       valid_url)
 
 def test_check_column_id():
-    feed = sample.copy()
-    assert not check_column_id([], 'routes', feed.routes, 'route_id')
-    feed.routes['route_id'].iat[0] = np.nan
-    assert check_column_id([], 'routes', feed.routes, 'route_id')
+    routes = sample.routes.copy()
+    assert not check_column_id([], 'routes', routes, 'route_id')
+    routes['route_id'].iat[0] = np.nan
+    assert check_column_id([], 'routes', routes, 'route_id')
 
 def test_check_column_linked_id():
-    feed = sample.copy()
-    assert not check_column_linked_id([], 'trips', feed.trips, 'route_id',
-      True, feed.routes)
-    feed.trips['route_id'].iat[0] = 'Hummus!'
-    assert check_column_linked_id([], 'trips', feed.trips, 'route_id',
-      True, feed.routes)
+    trips = sample.trips.copy()
+    assert not check_column_linked_id([], 'trips', trips, 'route_id',
+      True, sample.routes)
+    trips['route_id'].iat[0] = 'Hummus!'
+    assert check_column_linked_id([], 'trips', trips, 'route_id',
+      True, sample.routes)
 
 def test_format_problems():
     problems = [('ba', 'da', 'boom', 'boom')]
@@ -96,487 +381,90 @@ def test_format_problems():
 def test_check_agency():
     assert not check_agency(sample)
 
-    feed = sample.copy()
-    feed.agency = None
-    assert check_agency(feed)
-
-    feed = sample.copy()
-    del feed.agency['agency_name']
-    assert check_agency(feed)
-
-    feed = sample.copy()
-    feed.agency['b'] = 3
-    assert check_agency(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.agency = feed.agency.append(feed.agency.ix[0])
-    assert check_agency(feed)
-
-    feed = sample.copy()
-    feed.agency['agency_name'] = ''
-    assert check_agency(feed)
-
-    for col in ['agency_timezone', 'agency_url', 'agency_fare_url',
-      'agency_lang', 'agency_phone', 'agency_email']:
-        feed = sample.copy()
-        feed.agency[col] = ''
-        assert check_agency(feed)
-
 def test_check_calendar():
     assert not check_calendar(sample)
     assert check_calendar(sample, include_warnings=True) # feed has expired
 
-    feed = sample.copy()
+    feed = copy.copy(sample)
     feed.calendar = None
     assert not check_calendar(feed)
 
-    feed = sample.copy()
-    del feed.calendar['service_id']
-    assert check_calendar(feed)
-
-    feed = sample.copy()
-    feed.calendar['yo'] = 3
-    assert not check_calendar(feed)
-    assert check_calendar(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.calendar['service_id'].iat[0] = feed.calendar['service_id'].iat[1]
-    assert check_calendar(feed)
-
-    for col in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday',
-      'saturday', 'sunday', 'start_date', 'end_date']:
-        feed = sample.copy()
-        feed.calendar[col].iat[0] = '5'
-        assert check_calendar(feed)
-
 def test_check_calendar_dates():
     assert not check_calendar_dates(sample)
 
-    feed = sample.copy()
+    feed = copy.copy(sample)
     feed.calendar_dates = None
     assert not check_calendar_dates(feed)
 
-    feed = sample.copy()
-    del feed.calendar_dates['service_id']
-    assert check_calendar_dates(feed)
-
-    feed = sample.copy()
-    feed.calendar_dates['yo'] = 3
-    assert not check_calendar_dates(feed)
-    assert check_calendar_dates(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.calendar_dates = feed.calendar_dates.append(
-      feed.calendar_dates.ix[0])
-    assert check_calendar_dates(feed)
-
-    for col in ['date', 'exception_type']:
-        feed = sample.copy()
-        feed.calendar_dates[col].iat[0] = '5'
-        assert check_calendar_dates(feed)
-
 def test_check_fare_attributes():
     assert not check_fare_attributes(sample)
 
-    feed = sample.copy()
+    feed = copy.copy(sample)
     feed.fare_attributes = None
     assert not check_fare_attributes(feed)
 
-    feed = sample.copy()
-    del feed.fare_attributes['fare_id']
-    assert check_fare_attributes(feed)
-
-    feed = sample.copy()
-    feed.fare_attributes['yo'] = 3
-    assert not check_fare_attributes(feed)
-    assert check_fare_attributes(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.fare_attributes = feed.fare_attributes.append(
-      feed.fare_attributes.ix[0])
-    assert check_fare_attributes(feed)
-
-    feed = sample.copy()
-    feed.fare_attributes['currency_type'] = 'jubjub'
-    assert check_fare_attributes(feed)
-
-    for col in ['payment_method', 'transfers', 'transfer_duration']:
-        feed = sample.copy()
-        feed.fare_attributes[col] = -7
-        assert check_fare_attributes(feed)
-
 def test_check_fare_rules():
     assert not check_fare_rules(sample)
 
-    feed = sample.copy()
+    feed = copy.copy(sample)
     feed.fare_rules = None
     assert not check_fare_rules(feed)
 
-    feed = sample.copy()
-    del feed.fare_rules['fare_id']
-    assert check_fare_rules(feed)
-
-    feed = sample.copy()
-    feed.fare_rules['yo'] = 3
-    assert not check_fare_rules(feed)
-    assert check_fare_rules(feed, include_warnings=True)
-
-    for col in ['fare_id', 'route_id', 'origin_id', 'destination_id', 'contains_id']:
-        feed = sample.copy()
-        feed.fare_rules[col] = 'tuberosity'
-        print(col)
-        print(feed.fare_rules)
-        assert check_fare_rules(feed)
-
 def test_check_feed_info():
-    # Create feed_info table
-    feed = sample.copy()
-    columns = ['feed_publisher_name', 'feed_publisher_url', 'feed_lang',
-      'feed_start_date', 'feed_end_date', 'feed_version']
-    rows = [['slurp', 'http://slurp.burp', 'aa', '21110101', '21110102', '69']]
-    feed.feed_info = pd.DataFrame(rows, columns=columns)
+    feed = copy.copy(sample)
+    add_feed_info(feed)
     assert not check_feed_info(feed)
 
-    feed1 = feed.copy()
-    feed1.feed_info = None
-    assert not check_feed_info(feed1)
-
-    feed1 = feed.copy()
-    del feed1.feed_info['feed_lang']
-    assert check_feed_info(feed1)
-
-    feed1 = feed.copy()
-    feed1.feed_info['yo'] = 3
-    assert not check_feed_info(feed1)
-    assert check_feed_info(feed1, include_warnings=True)
-
-    for col in columns:
-        feed1 = feed.copy()
-        feed1.feed_info[col] = ''
-        assert check_feed_info(feed1)
+    feed.feed_info = None
+    assert not check_feed_info(feed)
 
 def test_check_frequencies():
     assert not check_frequencies(sample)
 
-    feed = sample.copy()
+    feed = copy.copy(sample)
     feed.frequencies = None
     assert not check_frequencies(feed)
 
-    feed = sample.copy()
-    del feed.frequencies['trip_id']
-    assert check_frequencies(feed)
-
-    feed = sample.copy()
-    feed.frequencies['yo'] = 3
-    assert not check_frequencies(feed)
-    assert check_frequencies(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.frequencies['trip_id'].iat[0] = 'ratatat'
-    assert check_frequencies(feed)
-
-    for col in ['start_time', 'end_time']:
-        feed = sample.copy()
-        feed.frequencies[col] = 'oingo'
-        assert check_frequencies(feed)
-
-    feed = sample.copy()
-    feed.frequencies = feed.frequencies.append(feed.frequencies.ix[0])
-    assert check_frequencies(feed)
-
-    for col in ['headway_secs', 'exact_times']:
-        feed = sample.copy()
-        feed.frequencies[col] = -7
-        assert check_frequencies(feed)
-
 def test_check_routes():
     assert not check_routes(sample)
 
-    feed = sample.copy()
-    feed.routes = None
-    assert check_routes(feed)
-
-    feed = sample.copy()
-    del feed.routes['route_id']
-    assert check_routes(feed)
-
-    feed = sample.copy()
-    feed.routes['bingo'] = 3
-    assert check_routes(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.routes['route_id'].iat[0] = feed.routes['route_id'].iat[1]
-    assert check_routes(feed)
-
-    feed = sample.copy()
-    feed.routes['agency_id'] = 'Hubba hubba'
-    assert check_routes(feed)
-
-    feed = sample.copy()
-    feed.routes['route_short_name'].iat[0] = ''
-    assert check_routes(feed)
-
-    feed = sample.copy()
-    feed.routes['route_short_name'].iat[0] = ''
-    feed.routes['route_long_name'].iat[0] = ''
-    assert check_routes(feed)
-
-    feed = sample.copy()
-    feed.routes['route_type'].iat[0] = 8
-    assert check_routes(feed)
-
-    feed = sample.copy()
-    feed.routes['route_color'].iat[0] = 'FFF'
-    assert check_routes(feed)
-
-    feed = sample.copy()
-    feed.routes['route_text_color'].iat[0] = 'FFF'
-    assert check_routes(feed)
-
-    feed = sample.copy()
-    feed.routes['route_short_name'].iat[1] =\
-      feed.routes['route_short_name'].iat[0]
-    feed.routes['route_long_name'].iat[1] =\
-      feed.routes['route_long_name'].iat[0]
-    assert not check_routes(feed)
-    assert check_routes(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.routes['route_id'].iat[0] = 'Shwing'
-    assert not check_routes(feed)
-    assert check_routes(feed, include_warnings=True)
-
 def test_check_shapes():
     assert not check_shapes(sample)
 
     # Make a nonempty shapes table to check
-    feed = sample.copy()
-    rows = [
-      ['1100015',-16.743632,145.668255,10001, 1.2],
-      ['1100015',-16.743522,145.668394,10002, 1.3],
-      ]
-    columns=['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence', 'shape_dist_traveled']
-    feed.shapes = pd.DataFrame(rows, columns=columns)
+    feed = copy.copy(sample)
+    add_shapes(feed)
     assert not check_shapes(feed)
 
-    feed1 = feed.copy()
-    del feed1.shapes['shape_id']
-    assert check_shapes(feed1)
-
-    feed1 = feed.copy()
-    feed1.shapes['yo'] = 3
-    assert not check_shapes(feed1)
-    assert check_shapes(feed1, include_warnings=True)
-
-    feed1 = feed.copy()
-    feed1.shapes['shape_id'].iat[0] = ''
-    assert check_shapes(feed1)
-
-    for column in ['shape_pt_lon', 'shape_pt_lat']:
-        feed1 = feed.copy()
-        feed1.shapes[column] = 185
-        assert check_shapes(feed1)
-
-    feed1 = feed.copy()
-    feed.shapes['shape_pt_sequence'].iat[1] =\
-      feed.shapes['shape_pt_sequence'].iat[0]
-    assert check_shapes(feed)
-
-    feed1 = feed.copy()
-    feed1.shapes['shape_dist_traveled'].iat[1] = 0
-    assert check_shapes(feed1)
-
 def test_check_stops():
     assert not check_stops(sample)
 
-    feed = sample.copy()
-    feed.stops = None
-    assert check_stops(feed)
-
-    feed = sample.copy()
-    del feed.stops['stop_id']
-    assert check_stops(feed)
-
-    feed = sample.copy()
-    feed.stops['b'] = 3
-    assert check_stops(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.stops['stop_id'].iat[0] = feed.stops['stop_id'].iat[1]
-    assert check_stops(feed)
-
-    for column in ['stop_code', 'stop_desc', 'zone_id', 'parent_station']:
-        feed = sample.copy()
-        feed.stops[column] = ''
-        assert check_stops(feed)
-
-    for column in ['stop_url', 'stop_timezone']:
-        feed = sample.copy()
-        feed.stops[column] = 'Wa wa'
-        assert check_stops(feed)
-
-    for column in ['stop_lon', 'stop_lat', 'location_type', 'wheelchair_boarding']:
-        feed = sample.copy()
-        feed.stops[column] = 185
-        assert check_stops(feed)
-
-    feed = sample.copy()
-    feed.stops['location_type'] = 1
-    feed.stops['parent_station'] = 'bingo'
-    assert check_stops(feed)
-
-    feed = sample.copy()
-    feed.stops['location_type'] = 0
-    feed.stops['parent_station'] = feed.stops['stop_id'].iat[1]
-    assert check_stops(feed)
-
-    feed = sample.copy()
-    feed.stops['stop_id'].iat[0] = 'Flippity flew'
-    assert not check_stops(feed)
-    assert check_stops(feed, include_warnings=True)
-
 def test_check_stop_times():
     assert not check_stop_times(sample)
 
-    feed = sample.copy()
-    feed.stop_times = None
-    assert check_stop_times(feed)
-
-    feed = sample.copy()
-    del feed.stop_times['stop_id']
-    assert check_stop_times(feed)
-
-    feed = sample.copy()
-    feed.stop_times['b'] = 3
-    assert check_stop_times(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.stop_times['trip_id'].iat[0] = 'bingo'
-    assert check_stop_times(feed)
-
-    for col in ['arrival_time', 'departure_time']:
-        feed = sample.copy()
-        feed.stop_times[col].iat[0] = '1:0:00'
-        assert check_stop_times(feed)
-
-    feed = sample.copy()
-    feed.stop_times['arrival_time'].iat[-1] = np.nan
-    assert check_stop_times(feed)
-
-    feed = sample.copy()
-    feed.stop_times['stop_id'].iat[0] = 'bingo'
-    assert check_stop_times(feed)
-
-    feed = sample.copy()
-    feed.stop_times['stop_headsign'].iat[0] = ''
-    assert check_stop_times(feed)
-
-    feed = sample.copy()
-    feed.stop_times['stop_sequence'].iat[1] =\
-      feed.stop_times['stop_sequence'].iat[0]
-    assert check_stop_times(feed)
-
-    for col in ['pickup_type', 'drop_off_type']:
-        feed = sample.copy()
-        feed.stop_times[col] = 'bongo'
-        assert check_stop_times(feed)
-
-    feed = sample.copy()
-    feed.stop_times['shape_dist_traveled'] = 1
-    feed.stop_times['shape_dist_traveled'].iat[1] = 0.9
-    assert check_stop_times(feed)
-
-    feed = sample.copy()
-    feed.stop_times['timepoint'] = 3
-    assert check_stop_times(feed)
-
-    feed = sample.copy()
-    feed.stop_times['departure_time'].iat[1] =\
-      feed.stop_times['departure_time'].iat[0]
-    assert not check_stop_times(feed)
-    assert check_stop_times(feed, include_warnings=True)
-
 def test_check_transfers():
     assert not check_transfers(sample)
 
-    # Create transfers table
-    feed = sample.copy()
-    columns = ['from_stop_id', 'to_stop_id', 'transfer_type', 'min_transfer_time']
-    rows = [[feed.stops['stop_id'].iat[0], feed.stops['stop_id'].iat[1], 2, 3600]]
-    feed.transfers = pd.DataFrame(rows, columns=columns)
+    feed = copy.copy(sample)
+    add_transfers(feed)
     assert not check_transfers(feed)
 
-    feed1 = feed.copy()
-    del feed1.transfers['from_stop_id']
-    assert check_transfers(feed1)
-
-    feed1 = feed.copy()
-    feed1.transfers['yo'] = 3
-    assert not check_transfers(feed1)
-    assert check_transfers(feed1, include_warnings=True)
-
-    for col in set(columns) - set(['transfer_type', 'min_transfer_time']):
-        feed1 = feed.copy()
-        feed1.transfers[col].iat[0] = ''
-        assert check_transfers(feed1)
-
-    for col in ['transfer_type', 'min_transfer_time']:
-        feed1 = feed.copy()
-        feed1.transfers[col] = -7
-        assert check_transfers(feed1)
-
 def test_check_trips():
     assert not check_trips(sample)
 
-    feed = sample.copy()
-    feed.trips = None
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    del feed.trips['trip_id']
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    feed.trips['b'] = 3
-    assert check_trips(feed, include_warnings=True)
-
-    feed = sample.copy()
-    feed.trips['trip_id'].iat[0] = feed.trips['trip_id'].iat[1]
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    feed.trips['route_id'] = 'Hubba hubba'
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    feed.trips['service_id'] = 'Boom boom'
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    feed.trips['direction_id'].iat[0] = 7
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    feed.trips['block_id'].iat[0] = ''
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    feed.trips['block_id'].iat[0] = 'Bam'
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    feed.trips['shape_id'].iat[0] = 'Hello'
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    feed.trips['wheelchair_accessible'] = ''
-    assert check_trips(feed)
-
-    feed = sample.copy()
-    tid = feed.trips['trip_id'].iat[0]
-    feed.stop_times = feed.stop_times[feed.stop_times['trip_id'] != tid].copy()
-    assert not check_trips(feed)
-    assert check_trips(feed, include_warnings=True)
+@pytest.mark.parametrize('check, mutate, is_warning', PROBLEMS,
+  ids=['{!s}-{!s}-{!s}'.format(check.__name__, mutate.__name__,
+  'warning' if is_warning else 'error')
+  for check, mutate, is_warning in PROBLEMS])
+def test_check_problems(check, mutate, is_warning):
+    # Copy only the tables that the mutator replaces
+    feed = copy.copy(sample)
+    mutate(feed)
+    if is_warning:
+        assert not check(feed)
+        assert check(feed, include_warnings=True)
+    else:
+        assert check(feed)
 
 def test_validate():
     assert not validate(sample, as_df=False, include_warnings=False)